@@ -1,225 +1,300 @@
 import os
 import io
+import re
+import shutil
 import tempfile
-from typing import BinaryIO, Dict, Any
+from typing import BinaryIO, Dict, Any, Iterable
 from pathlib import Path
 import zipfile
 import xml.etree.ElementTree as ET
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.utils import simpleSplit
+
+# Format-specific libraries are optional; a missing one only disables its formats
+try:
+    import ebooklib
+    from ebooklib import epub
+    _HAVE_EBOOKLIB = True
+except ImportError:
+    _HAVE_EBOOKLIB = False
+
+try:
+    import mobi
+    _HAVE_MOBI = True
+except ImportError:
+    _HAVE_MOBI = False
+
+try:
+    from lxml import html as lxml_html
+    from lxml.etree import ParserError
+    _HAVE_LXML = True
+except ImportError:
+    _HAVE_LXML = False
+
+from .tempdir import TEMP_DIR
+from .content_cache import info_cache
+from .document_converter import _docx_document, _fitz
+from .streams import InputData, as_bytes, as_stream, copy_to_file
+
+# RTF control words, braces and escaped symbols, stripped in a single pass
+_RTF_MARKUP = re.compile(rb'\\[a-z]+\d*\s?|[{}]|\\[^a-z]')
+
+# Plain-text page layout, matching Platypus' Normal style on a letter page
+# with one-inch margins
+_PAGE_MARGIN = 72
+_FONT_NAME = 'Helvetica'
+_FONT_SIZE = 10
+_LEADING = 12
+_PARAGRAPH_SPACING = 12
+
+# Fully qualified tags of ODT text paragraphs and the whitespace elements
+# ODF uses in place of literal tabs, line breaks and runs of spaces
+_ODT_TEXT_NS = '{urn:oasis:names:tc:opendocument:xmlns:text:1.0}'
+_ODT_PARAGRAPH = _ODT_TEXT_NS + 'p'
+_ODT_TAB = _ODT_TEXT_NS + 'tab'
+_ODT_LINE_BREAK = _ODT_TEXT_NS + 'line-break'
+_ODT_SPACES = _ODT_TEXT_NS + 's'
+_ODT_SPACE_COUNT = _ODT_TEXT_NS + 'c'
 
 class AdvancedDocumentConverter:
     """Advanced document converter with support for more formats and better quality"""
     
     @staticmethod
-    def convert_epub_to_pdf(input_file: BinaryIO) -> bytes:
+    def _text_blocks_to_pdf(text_blocks: Iterable[str]) -> bytes:
+        """Lay out plain-text blocks as PDF paragraphs, consuming them lazily.
+        
+        Unformatted text doesn't need the Platypus layout engine: lines are
+        pre-wrapped with real font metrics and each page is emitted as a
+        single text object.
+        """
+        output_buffer = io.BytesIO()
+        c = canvas.Canvas(output_buffer, pagesize=letter)
+        width, height = letter
+        max_width = width - 2 * _PAGE_MARGIN
+        top = height - _PAGE_MARGIN - _FONT_SIZE
+        
+        def new_page_text():
+            text = c.beginText(_PAGE_MARGIN, top)
+            text.setFont(_FONT_NAME, _FONT_SIZE, _LEADING)
+            return text
+        
+        text = new_page_text()
+        y = top
+        
+        for text_content in text_blocks:
+            # Collapse whitespace the way Paragraph markup does
+            lines = simpleSplit(' '.join(text_content.split()), _FONT_NAME, _FONT_SIZE, max_width)
+            if not lines:
+                continue
+            
+            for line in lines:
+                if y < _PAGE_MARGIN:
+                    c.drawText(text)
+                    c.showPage()
+                    text = new_page_text()
+                    y = top
+                text.textLine(line)
+                y -= _LEADING
+            
+            # Blank space between paragraphs
+            y -= _PARAGRAPH_SPACING
+            text.setTextOrigin(_PAGE_MARGIN, y)
+        
+        c.drawText(text)
+        c.save()
+        return output_buffer.getvalue()
+    
+    @staticmethod
+    def _html_root(content: bytes, parser=None):
+        """Parse an HTML document, or return None when it has no content to parse"""
+        if not content.strip():
+            return None
+        try:
+            return lxml_html.document_fromstring(content, parser=parser)
+        except ParserError:
+            # lxml refuses documents that are only whitespace, comments or a doctype
+            return None
+    
+    @staticmethod
+    def convert_epub_to_pdf(input_file: InputData) -> bytes:
         """Convert EPUB to PDF"""
         try:
-            from ebooklib import epub
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.pagesizes import letter
-            from reportlab.lib.styles import getSampleStyleSheet
-            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-            from bs4 import BeautifulSoup
-            import tempfile
-            import os
-            
-            input_file.seek(0)
+            if not (_HAVE_EBOOKLIB and _HAVE_LXML):
+                raise Exception("EPUB support requires the ebooklib and lxml packages")
             
             # Create temporary file
-            with tempfile.NamedTemporaryFile(suffix='.epub', delete=False) as temp_epub:
-                temp_epub.write(input_file.read())
+            with tempfile.NamedTemporaryFile(suffix='.epub', delete=False, dir=TEMP_DIR) as temp_epub:
+                copy_to_file(input_file, temp_epub)
                 temp_epub_path = temp_epub.name
             
             try:
                 # Read EPUB
                 book = epub.read_epub(temp_epub_path)
                 
-                # Create PDF
-                output_buffer = io.BytesIO()
-                doc = SimpleDocTemplate(output_buffer, pagesize=letter)
-                styles = getSampleStyleSheet()
-                story = []
-                
-                # Process each chapter
-                for item in book.get_items():
-                    if item.get_type() == epub.ITEM_DOCUMENT:
-                        # Extract text content
-                        soup = BeautifulSoup(item.get_content(), 'html.parser')
-                        text_content = soup.get_text()
-                        
-                        # Add to PDF
-                        if text_content.strip():
-                            para = Paragraph(text_content, styles['Normal'])
-                            story.append(para)
-                            story.append(Spacer(1, 12))
+                # Extract each chapter's text lazily, as the layout engine asks for more
+                # content, reusing one parser for every chapter in the book and
+                # skipping empty items such as placeholder cover pages
+                parser = lxml_html.HTMLParser()
+                roots = (
+                    AdvancedDocumentConverter._html_root(item.get_content(), parser)
+                    for item in book.get_items()
+                    if item.get_type() == ebooklib.ITEM_DOCUMENT
+                )
+                chapters = (root.text_content() for root in roots if root is not None)
                 
                 # Build PDF
-                doc.build(story)
-                return output_buffer.getvalue()
+                return AdvancedDocumentConverter._text_blocks_to_pdf(chapters)
                 
             finally:
                 if os.path.exists(temp_epub_path):
                     os.unlink(temp_epub_path)
                     
         except Exception as e:
-            raise Exception(f"EPUB to PDF conversion failed: {str(e)}")
+            raise Exception(f"EPUB to PDF conversion failed: {str(e)}") from e
     
     @staticmethod
-    def convert_mobi_to_pdf(input_file: BinaryIO) -> bytes:
+    def convert_mobi_to_pdf(input_file: InputData) -> bytes:
         """Convert MOBI to PDF"""
         try:
-            # MOBI conversion requires additional libraries
-            # For now, we'll provide a basic implementation
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.pagesizes import letter
-            
-            input_file.seek(0)
-            content = input_file.read()
-            
-            # Basic MOBI to PDF conversion
-            output_buffer = io.BytesIO()
-            c = canvas.Canvas(output_buffer, pagesize=letter)
-            width, height = letter
+            if not (_HAVE_MOBI and _HAVE_LXML):
+                raise Exception("MOBI support requires the mobi and lxml packages")
             
-            # Extract text from MOBI (simplified)
-            text_content = content.decode('utf-8', errors='ignore')
+            with tempfile.NamedTemporaryFile(suffix='.mobi', delete=False, dir=TEMP_DIR) as temp_mobi:
+                copy_to_file(input_file, temp_mobi)
+                temp_mobi_path = temp_mobi.name
             
-            y = height - 50
-            lines = text_content.split('\n')
-            
-            for line in lines[:100]:  # Limit to first 100 lines
-                if y < 50:
-                    c.showPage()
-                    y = height - 50
+            extract_dir = None
+            try:
+                # Unpack the book; KF8 books come out as EPUB, older ones as HTML
+                extract_dir, extracted_path = mobi.extract(temp_mobi_path)
+                extension = os.path.splitext(extracted_path)[1].lower()
                 
-                c.drawString(50, y, line[:80])  # Limit line length
-                y -= 15
-            
-            c.save()
-            return output_buffer.getvalue()
+                if extension == '.epub':
+                    with open(extracted_path, 'rb') as epub_file:
+                        return AdvancedDocumentConverter.convert_epub_to_pdf(epub_file)
+                
+                if extension == '.pdf':
+                    with open(extracted_path, 'rb') as pdf_file:
+                        return pdf_file.read()
+                
+                with open(extracted_path, 'rb') as html_file:
+                    root = AdvancedDocumentConverter._html_root(html_file.read())
+                
+                # MOBI HTML keeps the whole book in one file; lay it out paragraph by paragraph
+                paragraphs = () if root is None else (
+                    element.text_content() for element in root.iter('p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+                )
+                return AdvancedDocumentConverter._text_blocks_to_pdf(paragraphs)
+                
+            finally:
+                if os.path.exists(temp_mobi_path):
+                    os.unlink(temp_mobi_path)
+                if extract_dir and os.path.isdir(extract_dir):
+                    shutil.rmtree(extract_dir, ignore_errors=True)
             
         except Exception as e:
-            raise Exception(f"MOBI to PDF conversion failed: {str(e)}")
+            raise Exception(f"MOBI to PDF conversion failed: {str(e)}") from e
     
     @staticmethod
-    def convert_rtf_to_pdf(input_file: BinaryIO) -> bytes:
+    def convert_rtf_to_pdf(input_file: InputData) -> bytes:
         """Convert RTF to PDF with formatting preservation"""
         try:
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.pagesizes import letter
-            from reportlab.lib.styles import getSampleStyleSheet
-            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-            import re
-            
-            input_file.seek(0)
-            rtf_content = input_file.read().decode('utf-8', errors='ignore')
+            rtf_content = as_bytes(input_file)
             
             # Basic RTF parsing (simplified)
             # Remove RTF control codes
-            text_content = re.sub(r'\\[a-z]+\d*\s?', '', rtf_content)
-            text_content = re.sub(r'[{}]', '', text_content)
-            text_content = re.sub(r'\\[^a-z]', '', text_content)
-            
-            # Create PDF
-            output_buffer = io.BytesIO()
-            doc = SimpleDocTemplate(output_buffer, pagesize=letter)
-            styles = getSampleStyleSheet()
-            story = []
+            text_content = _RTF_MARKUP.sub(b'', rtf_content).decode('utf-8', errors='ignore')
             
             # Split into paragraphs
             paragraphs = text_content.split('\n\n')
             
-            for para_text in paragraphs:
-                if para_text.strip():
-                    para = Paragraph(para_text.strip(), styles['Normal'])
-                    story.append(para)
-                    story.append(Spacer(1, 12))
-            
             # Build PDF
-            doc.build(story)
-            return output_buffer.getvalue()
+            return AdvancedDocumentConverter._text_blocks_to_pdf(paragraphs)
             
         except Exception as e:
-            raise Exception(f"RTF to PDF conversion failed: {str(e)}")
+            raise Exception(f"RTF to PDF conversion failed: {str(e)}") from e
     
     @staticmethod
-    def convert_odt_to_pdf(input_file: BinaryIO) -> bytes:
+    def _odt_text(element: ET.Element) -> Iterable[str]:
+        """Yield an ODT element's text, expanding text:tab, text:line-break and text:s"""
+        if element.tag == _ODT_TAB:
+            yield ' '
+        elif element.tag == _ODT_LINE_BREAK:
+            yield '\n'
+        elif element.tag == _ODT_SPACES:
+            yield ' ' * int(element.get(_ODT_SPACE_COUNT) or 1)
+        elif element.text:
+            yield element.text
+        for child in element:
+            yield from AdvancedDocumentConverter._odt_text(child)
+            if child.tail:
+                yield child.tail
+    
+    @staticmethod
+    def _iter_odt_paragraphs(input_file: BinaryIO) -> Iterable[str]:
+        """Stream paragraph text out of an ODT's content.xml without building a DOM"""
+        with zipfile.ZipFile(input_file) as odt_zip:
+            with odt_zip.open('content.xml') as content:
+                for _, element in ET.iterparse(content, events=('end',)):
+                    if element.tag == _ODT_PARAGRAPH:
+                        yield ''.join(AdvancedDocumentConverter._odt_text(element))
+                        # Release the paragraph so memory stays flat on large documents
+                        element.clear()
+    
+    @staticmethod
+    def convert_odt_to_pdf(input_file: InputData) -> bytes:
         """Convert ODT to PDF"""
         try:
-            from odf.opendocument import load
-            from odf.text import P
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.pagesizes import letter
-            from reportlab.lib.styles import getSampleStyleSheet
-            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
-            import tempfile
-            import os
-            
-            input_file.seek(0)
+            # Extract text from paragraphs
+            paragraphs = AdvancedDocumentConverter._iter_odt_paragraphs(as_stream(input_file))
             
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(suffix='.odt', delete=False) as temp_odt:
-                temp_odt.write(input_file.read())
-                temp_odt_path = temp_odt.name
+            # Build PDF
+            return AdvancedDocumentConverter._text_blocks_to_pdf(paragraphs)
             
-            try:
-                # Load ODT document
-                doc = load(temp_odt_path)
-                
-                # Create PDF
-                output_buffer = io.BytesIO()
-                pdf_doc = SimpleDocTemplate(output_buffer, pagesize=letter)
-                styles = getSampleStyleSheet()
-                story = []
-                
-                # Extract text from paragraphs
-                for paragraph in doc.getElementsByType(P):
-                    text = paragraph.getText()
-                    if text.strip():
-                        para = Paragraph(text, styles['Normal'])
-                        story.append(para)
-                        story.append(Spacer(1, 12))
-                
-                # Build PDF
-                pdf_doc.build(story)
-                return output_buffer.getvalue()
-                
-            finally:
-                if os.path.exists(temp_odt_path):
-                    os.unlink(temp_odt_path)
-                    
         except Exception as e:
-            raise Exception(f"ODT to PDF conversion failed: {str(e)}")
+            raise Exception(f"ODT to PDF conversion failed: {str(e)}") from e
     
     @staticmethod
-    def get_document_info(input_file: BinaryIO, source_format: str) -> Dict[str, Any]:
+    def get_document_info(input_file: InputData, source_format: str) -> Dict[str, Any]:
         """Get detailed information about a document"""
         try:
+            # Measure the stream instead of reading it; the parsers below
+            # accept seekable file objects directly
+            input_file = as_stream(input_file)
+            input_file.seek(0, io.SEEK_END)
+            size = input_file.tell()
             input_file.seek(0)
-            content = input_file.read()
+            
+            cache_key = ('document', source_format.lower(), info_cache.digest(input_file))
+            cached_info = info_cache.get(cache_key)
+            if cached_info is not None:
+                return cached_info
             
             info = {
-                'size_bytes': len(content),
+                'size_bytes': size,
                 'format': source_format.upper(),
                 'category': 'document'
             }
             
             if source_format.lower() == 'pdf':
-                from PyPDF2 import PdfReader
-                reader = PdfReader(io.BytesIO(content))
-                info.update({
-                    'pages': len(reader.pages),
-                    'title': reader.metadata.get('/Title', '') if reader.metadata else '',
-                    'author': reader.metadata.get('/Author', '') if reader.metadata else '',
-                    'subject': reader.metadata.get('/Subject', '') if reader.metadata else '',
-                    'creator': reader.metadata.get('/Creator', '') if reader.metadata else '',
-                    'producer': reader.metadata.get('/Producer', '') if reader.metadata else '',
-                    'creation_date': str(reader.metadata.get('/CreationDate', '')) if reader.metadata else '',
-                    'modification_date': str(reader.metadata.get('/ModDate', '')) if reader.metadata else ''
-                })
+                # MuPDF reads the trailer and page count without walking the
+                # whole object tree the way PyPDF2's reader does
+                with _fitz().open(stream=input_file.read(), filetype="pdf") as pdf_document:
+                    metadata = pdf_document.metadata or {}
+                    info.update({
+                        'pages': pdf_document.page_count,
+                        'title': metadata.get('title', ''),
+                        'author': metadata.get('author', ''),
+                        'subject': metadata.get('subject', ''),
+                        'creator': metadata.get('creator', ''),
+                        'producer': metadata.get('producer', ''),
+                        'creation_date': str(metadata.get('creationDate', '')),
+                        'modification_date': str(metadata.get('modDate', ''))
+                    })
             
             elif source_format.lower() in ['docx', 'doc']:
-                from docx import Document
-                doc = Document(io.BytesIO(content))
+                doc = _docx_document()(input_file)
                 info.update({
                     'paragraphs': len(doc.paragraphs),
                     'tables': len(doc.tables),
@@ -227,16 +302,18 @@ class AdvancedDocumentConverter:
                 })
             
             elif source_format.lower() == 'epub':
-                from ebooklib import epub
-                book = epub.read_epub(io.BytesIO(content))
+                if not _HAVE_EBOOKLIB:
+                    raise Exception("EPUB support requires the ebooklib package")
+                book = epub.read_epub(input_file)
                 info.update({
                     'title': book.get_metadata('DC', 'title')[0][0] if book.get_metadata('DC', 'title') else '',
                     'author': book.get_metadata('DC', 'creator')[0][0] if book.get_metadata('DC', 'creator') else '',
                     'language': book.get_metadata('DC', 'language')[0][0] if book.get_metadata('DC', 'language') else '',
-                    'chapters': len([item for item in book.get_items() if item.get_type() == epub.ITEM_DOCUMENT])
+                    'chapters': len([item for item in book.get_items() if item.get_type() == ebooklib.ITEM_DOCUMENT])
                 })
             
+            info_cache.set(cache_key, info)
             return info
             
         except Exception as e:
-            return {'error': str(e), 'size_bytes': len(content) if 'content' in locals() else 0}
\ No newline at end of file
+            return {'error': str(e), 'size_bytes': size if 'size' in locals() else 0}
\ No newline at end of file
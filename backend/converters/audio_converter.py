@@ -1,128 +1,226 @@
 import os
-import io
+import json
 import tempfile
-from typing import BinaryIO
-from pydub import AudioSegment
-from pydub.utils import which
+from .tempdir import TEMP_DIR
+from .content_cache import info_cache
+from .subprocesses import run_tool
+from .streams import InputData, as_bytes, copy_to_file, file_path
+
+# Demuxer names for sources FFmpeg can read from a non-seekable pipe.
+# MP4/M4A (moov atom may trail the data) and WMA/ASF need to seek, so
+# those still go through a temporary file.
+_PIPE_INPUT_FORMATS = {
+    'mp3': 'mp3',
+    'wav': 'wav',
+    'ogg': 'ogg',
+    'flac': 'flac',
+    'aac': 'aac',
+    'aiff': 'aiff',
+    'au': 'au',
+}
+
+# Targets whose muxers never seek back to patch headers, so their output
+# can be streamed to stdout. MP3 is left out: the VBR preset needs the muxer
+# to go back and fill in the Xing/LAME header, or players get the duration
+# and seeking wrong.
+_PIPE_OUTPUT_FORMATS = {'ogg', 'aac', 'au'}
+
+# Sources that carry their length in the header, so ffprobe can report a
+# duration without seeking to the end of the stream
+_PIPE_PROBE_FORMATS = {'wav', 'flac', 'aiff', 'au'}
+
+# Let libavcodec and the filter graph use every core
+_FILTER_THREADS = str(os.cpu_count() or 1)
+
+# FFmpeg output settings per target format
+_EXPORT_PARAMS = {
+    'mp3': {
+        'format': 'mp3',
+        'bitrate': '320k',
+        'parameters': ['-q:a', '0']  # High quality
+    },
+    'wav': {'format': 'wav'},
+    'flac': {
+        'format': 'flac',
+        'parameters': ['-compression_level', '8']  # High compression
+    },
+    'ogg': {
+        'format': 'ogg',
+        'parameters': ['-q:a', '6']  # Good quality
+    },
+    'aac': {
+        'format': 'adts',  # FFmpeg's muxer for raw AAC streams
+        'codec': 'aac',
+        'bitrate': '256k'
+    },
+    'm4a': {
+        'format': 'mp4',
+        'codec': 'aac',
+        'bitrate': '256k'
+    },
+    'wma': {
+        'format': 'asf',  # WMA audio lives in an ASF container
+        'codec': 'wmav2'
+    },
+    'aiff': {'format': 'aiff'},
+    'au': {'format': 'au'},
+}
+
+# Source/target pairs that carry the same codec in different containers, so
+# the stream can be copied instead of decoded and re-encoded. PCM pairs such
+# as wav/aiff are left out: WAV is little-endian and AIFF/AU are big-endian,
+# so those still need a (cheap) sample conversion.
+_REMUX = {
+    ('m4a', 'aac'): [],
+    ('aac', 'm4a'): ['-bsf:a', 'aac_adtstoasc'],
+}
+
+# Bytes per sample for FFmpeg's sample formats (planar variants share widths)
+_SAMPLE_WIDTHS = {'u8': 1, 's16': 2, 's32': 4, 'flt': 4, 'dbl': 8, 's64': 8}
 
 class AudioConverter:
     @staticmethod
-    def convert_audio(input_file: BinaryIO, source_format: str, target_format: str) -> bytes:
+    def _write_temp_file(input_file: InputData, suffix: str) -> str:
+        """Copy the input into a temporary file and return its path"""
+        with tempfile.NamedTemporaryFile(suffix=f'.{suffix}', delete=False, dir=TEMP_DIR) as temp_file:
+            copy_to_file(input_file, temp_file)
+            return temp_file.name
+    
+    @staticmethod
+    def _export_args(export_params: dict) -> list:
+        """Translate export parameters into FFmpeg output arguments"""
+        args = []
+        if 'codec' in export_params:
+            args.extend(['-c:a', export_params['codec']])
+        if 'bitrate' in export_params:
+            args.extend(['-b:a', export_params['bitrate']])
+        args.extend(export_params.get('parameters', []))
+        args.extend(['-f', export_params['format']])
+        return args
+    
+    @staticmethod
+    def _run_to_output(command: list, target_format: str, input_data, temp_paths: list) -> bytes:
+        """Run an FFmpeg command that still lacks its output, streaming the result
+        through stdout when the target allows it and through a temporary file otherwise"""
+        if target_format in _PIPE_OUTPUT_FORMATS:
+            return run_tool([*command, 'pipe:1'], input_data)
+        
+        with tempfile.NamedTemporaryFile(suffix=f'.{target_format}', delete=False, dir=TEMP_DIR) as temp_output:
+            temp_output_path = temp_output.name
+        temp_paths.append(temp_output_path)
+        
+        run_tool([*command, temp_output_path], input_data)
+        with open(temp_output_path, 'rb') as output_file:
+            return output_file.read()
+    
+    @staticmethod
+    def convert_audio(input_file: InputData, source_format: str, target_format: str) -> bytes:
         """Convert audio from one format to another"""
         try:
-            input_file.seek(0)
-            
-            # Create temporary files
-            with tempfile.NamedTemporaryFile(suffix=f'.{source_format.lower()}', delete=False) as temp_input:
-                temp_input.write(input_file.read())
-                temp_input_path = temp_input.name
+            temp_paths = []
             
             try:
-                # Load audio file
-                if source_format.lower() == 'mp3':
-                    audio = AudioSegment.from_mp3(temp_input_path)
-                elif source_format.lower() == 'wav':
-                    audio = AudioSegment.from_wav(temp_input_path)
-                elif source_format.lower() == 'ogg':
-                    audio = AudioSegment.from_ogg(temp_input_path)
-                elif source_format.lower() == 'flac':
-                    audio = AudioSegment.from_file(temp_input_path, format='flac')
-                elif source_format.lower() == 'm4a':
-                    audio = AudioSegment.from_file(temp_input_path, format='m4a')
-                elif source_format.lower() == 'aac':
-                    audio = AudioSegment.from_file(temp_input_path, format='aac')
-                elif source_format.lower() == 'wma':
-                    audio = AudioSegment.from_file(temp_input_path, format='wma')
-                elif source_format.lower() == 'aiff':
-                    audio = AudioSegment.from_file(temp_input_path, format='aiff')
-                elif source_format.lower() == 'au':
-                    audio = AudioSegment.from_file(temp_input_path, format='au')
-                else:
-                    audio = AudioSegment.from_file(temp_input_path)
+                source_format = source_format.lower()
+                target_format = target_format.lower()
+                export_params = _EXPORT_PARAMS.get(target_format, {'format': target_format})
                 
-                # Export to target format
-                output_buffer = io.BytesIO()
-                
-                # Set export parameters based on target format
-                export_params = {}
-                if target_format.lower() == 'mp3':
-                    export_params = {
-                        'format': 'mp3',
-                        'bitrate': '320k',
-                        'parameters': ['-q:a', '0']  # High quality
-                    }
-                elif target_format.lower() == 'wav':
-                    export_params = {'format': 'wav'}
-                elif target_format.lower() == 'flac':
-                    export_params = {
-                        'format': 'flac',
-                        'parameters': ['-compression_level', '8']  # High compression
-                    }
-                elif target_format.lower() == 'ogg':
-                    export_params = {
-                        'format': 'ogg',
-                        'parameters': ['-q:a', '6']  # Good quality
-                    }
-                elif target_format.lower() == 'aac':
-                    export_params = {
-                        'format': 'aac',
-                        'bitrate': '256k'
-                    }
-                elif target_format.lower() == 'm4a':
-                    export_params = {
-                        'format': 'mp4',
-                        'codec': 'aac',
-                        'bitrate': '256k'
-                    }
-                elif target_format.lower() == 'wma':
-                    export_params = {'format': 'wma'}
-                elif target_format.lower() == 'aiff':
-                    export_params = {'format': 'aiff'}
-                elif target_format.lower() == 'au':
-                    export_params = {'format': 'au'}
+                # Decode and encode in a single FFmpeg process, streaming through
+                # stdin/stdout whenever the container allows it
+                command = ['ffmpeg', '-y', '-filter_threads', _FILTER_THREADS, '-threads', '0']
+                input_data = None
+                input_path = file_path(input_file)
+                if input_path is not None:
+                    # Already on disk: FFmpeg reads it in place and can seek
+                    command.extend(['-i', input_path])
+                elif source_format in _PIPE_INPUT_FORMATS:
+                    command.extend(['-f', _PIPE_INPUT_FORMATS[source_format], '-i', 'pipe:0'])
+                    input_data = as_bytes(input_file)
                 else:
-                    export_params = {'format': target_format.lower()}
+                    temp_input_path = AudioConverter._write_temp_file(input_file, source_format)
+                    temp_paths.append(temp_input_path)
+                    command.extend(['-i', temp_input_path])
                 
-                audio.export(output_buffer, **export_params)
+                command.extend(['-vn', '-threads', '0'])
+                remux_args = _REMUX.get((source_format, target_format))
+                if remux_args is not None:
+                    # Same codec, different container: rewrap without transcoding.
+                    # An M4A may also hold ALAC or MP3, which ADTS can't carry;
+                    # FFmpeg then fails and the stream is encoded instead.
+                    try:
+                        return AudioConverter._run_to_output(
+                            [*command, '-c:a', 'copy', *remux_args, '-f', export_params['format']],
+                            target_format, input_data, temp_paths
+                        )
+                    except Exception:
+                        pass
                 
-                return output_buffer.getvalue()
+                return AudioConverter._run_to_output(
+                    [*command, *AudioConverter._export_args(export_params)],
+                    target_format, input_data, temp_paths
+                )
                 
             finally:
-                # Clean up temporary file
-                if os.path.exists(temp_input_path):
-                    os.unlink(temp_input_path)
+                # Clean up temporary files
+                for path in temp_paths:
+                    if os.path.exists(path):
+                        os.unlink(path)
                     
         except Exception as e:
-            raise Exception(f"Audio conversion failed: {str(e)}")
+            raise Exception(f"Audio conversion failed: {str(e)}") from e
     
     @staticmethod
-    def get_audio_info(input_file: BinaryIO, source_format: str) -> dict:
+    def get_audio_info(input_file: InputData, source_format: str) -> dict:
         """Get audio file information"""
         try:
-            input_file.seek(0)
+            source_format = source_format.lower()
+            cache_key = ('audio', source_format, info_cache.digest(input_file))
+            cached_info = info_cache.get(cache_key)
+            if cached_info is not None:
+                return cached_info
+            
+            temp_path = None
             
-            with tempfile.NamedTemporaryFile(suffix=f'.{source_format.lower()}', delete=False) as temp_file:
-                temp_file.write(input_file.read())
-                temp_path = temp_file.name
+            command = [
+                'ffprobe', '-v', 'error',
+                '-select_streams', 'a:0',
+                '-show_entries', 'stream=channels,sample_rate,sample_fmt,bits_per_sample:format=duration',
+                '-of', 'json'
+            ]
             
             try:
-                if source_format.lower() == 'mp3':
-                    audio = AudioSegment.from_mp3(temp_path)
-                elif source_format.lower() == 'wav':
-                    audio = AudioSegment.from_wav(temp_path)
+                input_data = None
+                input_path = file_path(input_file)
+                if input_path is not None:
+                    command.extend(['-i', input_path])
+                elif source_format in _PIPE_PROBE_FORMATS:
+                    command.extend(['-f', _PIPE_INPUT_FORMATS[source_format], '-i', 'pipe:0'])
+                    input_data = as_bytes(input_file)
                 else:
-                    audio = AudioSegment.from_file(temp_path)
+                    temp_path = AudioConverter._write_temp_file(input_file, source_format)
+                    command.extend(['-i', temp_path])
+                
+                probe = json.loads(run_tool(command, input_data))
+                streams = probe.get('streams') or []
+                if not streams:
+                    raise Exception("No audio stream found")
+                stream = streams[0]
+                
+                sample_width = (stream.get('bits_per_sample') or 0) // 8
+                if not sample_width:
+                    sample_width = _SAMPLE_WIDTHS.get(stream.get('sample_fmt', '').rstrip('p'), 2)
                 
-                return {
-                    'duration_seconds': len(audio) / 1000.0,
-                    'channels': audio.channels,
-                    'frame_rate': audio.frame_rate,
-                    'sample_width': audio.sample_width,
-                    'max_possible_amplitude': audio.max_possible_amplitude
+                info = {
+                    'duration_seconds': float(probe.get('format', {}).get('duration', 0)),
+                    'channels': stream.get('channels'),
+                    'frame_rate': int(stream.get('sample_rate', 0)),
+                    'sample_width': sample_width,
+                    'max_possible_amplitude': (1 << (8 * sample_width)) // 2
                 }
+                info_cache.set(cache_key, info)
+                return info
             finally:
-                if os.path.exists(temp_path):
+                if temp_path and os.path.exists(temp_path):
                     os.unlink(temp_path)
                     
         except Exception as e:
-            return {'error': str(e)}
\ No newline at end of file
+            return {'error': str(e)}
@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+import xxhash
+from .streams import InputData
+
+def new_hasher():
+    """Start an XXH3-128 hash, the one content fingerprint used across the converters"""
+    return xxhash.xxh3_128()
+
+class ContentCache:
+    """Small in-process LRU for results derived from file content, keyed by
+    content digests (or other cheap identities of the content)"""
+    
+    def __init__(self, max_entries: int = 256, copy: Optional[Callable[[Any], Any]] = None,
+                 chunk_size: int = 1 << 20):
+        self.max_entries = max_entries
+        self.copy = copy
+        self.chunk_size = chunk_size
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def digest(self, input_file: InputData) -> str:
+        """Hash the input, reading streams in chunks and rewinding them"""
+        hasher = new_hasher()
+        if not hasattr(input_file, 'read'):
+            hasher.update(input_file)
+            return hasher.hexdigest()
+        input_file.seek(0)
+        for chunk in iter(lambda: input_file.read(self.chunk_size), b''):
+            hasher.update(chunk)
+        input_file.seek(0)
+        return hasher.hexdigest()
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a cached value, marking it as recently used; mutable values come back as copies"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                return None
+            self._entries.move_to_end(key)
+        return self.copy(value) if self.copy else value
+    
+    def set(self, key: Hashable, value: Any):
+        """Cache a value, evicting the least recently used entries over the limit"""
+        if self.copy:
+            value = self.copy(value)
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+# Shared by the audio and document info probes; callers may mutate the dicts they get
+info_cache = ContentCache(copy=dict)
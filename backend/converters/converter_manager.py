@@ -1,15 +1,38 @@
 import os
 import tempfile
-from typing import BinaryIO, Dict, Any
-from .image_converter import ImageConverter
-from .document_converter import DocumentConverter
-from .advanced_document_converter import AdvancedDocumentConverter
-from .audio_converter import AudioConverter
-from .video_converter import VideoConverter
-import sys
-sys.path.append('/app/backend')
+from functools import lru_cache
+from typing import BinaryIO, Callable, Dict, Any, Optional, Tuple, Union
+from .tempdir import TEMP_DIR
+from .content_cache import ContentCache, new_hasher
 from utils.cache import cache
 
+# Converter modules pull in heavy libraries (Pillow, ReportLab, PyMuPDF,
+# MoviePy, ...), so each one is imported on first use
+@lru_cache(maxsize=None)
+def _image_converter():
+    from .image_converter import ImageConverter
+    return ImageConverter
+
+@lru_cache(maxsize=None)
+def _document_converter():
+    from .document_converter import DocumentConverter
+    return DocumentConverter
+
+@lru_cache(maxsize=None)
+def _advanced_document_converter():
+    from .advanced_document_converter import AdvancedDocumentConverter
+    return AdvancedDocumentConverter
+
+@lru_cache(maxsize=None)
+def _audio_converter():
+    from .audio_converter import AudioConverter
+    return AudioConverter
+
+@lru_cache(maxsize=None)
+def _video_converter():
+    from .video_converter import VideoConverter
+    return VideoConverter
+
 class ConversionManager:
     """Main conversion manager that routes conversions to appropriate converters"""
     
@@ -24,153 +47,177 @@ class ConversionManager:
         'archive': ['zip', 'rar', '7z', 'tar', 'gz', 'bz2']
     }
     
+    # Inverted index of FORMAT_CATEGORIES for constant-time category lookups
+    _FORMAT_TO_CATEGORY = {fmt: category for category, formats in FORMAT_CATEGORIES.items() for fmt in formats}
+    
+    # Extensions that name the same encoding, so converting between them changes nothing
+    _FORMAT_ALIASES = {'jpeg': 'jpg'}
+    
+    # Special cross-category conversions we support, stored in both directions
+    _SUPPORTED_CROSS = frozenset(
+        pair
+        for source_cat, target_cat in [
+            ('image', 'document'),  # Image to PDF / PDF to Image
+            ('video', 'audio'),     # Video to Audio
+            ('video', 'image'),     # Video to GIF
+        ]
+        for pair in ((source_cat, target_cat), (target_cat, source_cat))
+    )
+    
+    # Converters for specific (source, target) pairs that take only the input file,
+    # as (converter class getter, method name)
+    _DISPATCH: Dict[Tuple[str, str], Tuple[Callable[[], type], str]] = {
+        # Document conversions
+        ('pdf', 'txt'): (_document_converter, 'convert_pdf_to_text'),
+        ('doc', 'txt'): (_document_converter, 'convert_docx_to_txt'),
+        ('docx', 'txt'): (_document_converter, 'convert_docx_to_txt'),
+        ('doc', 'pdf'): (_document_converter, 'convert_docx_to_pdf'),
+        ('docx', 'pdf'): (_document_converter, 'convert_docx_to_pdf'),
+        ('txt', 'pdf'): (_document_converter, 'convert_txt_to_pdf'),
+        ('pdf', 'doc'): (_document_converter, 'convert_pdf_to_docx'),
+        ('pdf', 'docx'): (_document_converter, 'convert_pdf_to_docx'),
+        
+        # PDF to image conversions
+        ('pdf', 'jpg'): (_document_converter, 'convert_pdf_to_jpg'),
+        ('pdf', 'jpeg'): (_document_converter, 'convert_pdf_to_jpg'),
+        ('pdf', 'png'): (_document_converter, 'convert_pdf_to_png'),
+        ('pdf', 'zip'): (_document_converter, 'convert_pdf_to_images_zip'),
+        
+        # Advanced document conversions
+        ('epub', 'pdf'): (_advanced_document_converter, 'convert_epub_to_pdf'),
+        ('mobi', 'pdf'): (_advanced_document_converter, 'convert_mobi_to_pdf'),
+        ('rtf', 'pdf'): (_advanced_document_converter, 'convert_rtf_to_pdf'),
+        ('odt', 'pdf'): (_advanced_document_converter, 'convert_odt_to_pdf'),
+        
+        # Spreadsheet conversions
+        ('xls', 'csv'): (_document_converter, 'convert_excel_to_csv'),
+        ('xlsx', 'csv'): (_document_converter, 'convert_excel_to_csv'),
+        ('csv', 'xls'): (_document_converter, 'convert_csv_to_excel'),
+        ('csv', 'xlsx'): (_document_converter, 'convert_csv_to_excel'),
+    }
+    
+    # Uploads are hashed and copied in slices that stay cache-resident
+    _SPOOL_CHUNK = 1 << 20
+    
+    # Spooled uploads stay in memory up to this size, then spill to tmpfs
+    _SPOOL_MAX_MEMORY = 8 << 20
+    
+    @classmethod
+    def _hash_and_spool(cls, input_file: BinaryIO) -> Tuple[str, BinaryIO]:
+        """Fingerprint the input while copying it into a spooled temp file"""
+        hasher = new_hasher()
+        spooled_file = tempfile.SpooledTemporaryFile(max_size=cls._SPOOL_MAX_MEMORY, dir=TEMP_DIR)
+        input_file.seek(0)
+        while chunk := input_file.read(cls._SPOOL_CHUNK):
+            hasher.update(chunk)
+            spooled_file.write(chunk)
+        spooled_file.seek(0)
+        return hasher.hexdigest(), spooled_file
+    
+    # Fingerprints of on-disk inputs keyed by (path, st_mtime_ns, st_size)
+    _stat_fingerprints = ContentCache(max_entries=1024, chunk_size=_SPOOL_CHUNK)
+    
+    @classmethod
+    def _stat_key(cls, input_file: BinaryIO) -> Optional[Tuple[str, int, int]]:
+        """Identify an input backed by a named file on disk by its path, mtime and size"""
+        name = getattr(input_file, 'name', None)
+        if not isinstance(name, str) or not os.path.isfile(name):
+            return None
+        stat = os.stat(name)
+        return (os.path.abspath(name), stat.st_mtime_ns, stat.st_size)
+    
+    @classmethod
+    def _file_fingerprint(cls, input_file: BinaryIO, stat_key: Tuple[str, int, int]) -> str:
+        """Fingerprint a file-backed input, hashing it only if it changed since it was last seen"""
+        file_hash = cls._stat_fingerprints.get(stat_key)
+        if file_hash is None:
+            file_hash = cls._stat_fingerprints.digest(input_file)
+            cls._stat_fingerprints.set(stat_key, file_hash)
+        return file_hash
+    
     @classmethod
     def get_format_category(cls, format_name: str) -> str:
         """Get the category of a format"""
-        format_lower = format_name.lower()
-        for category, formats in cls.FORMAT_CATEGORIES.items():
-            if format_lower in formats:
-                return category
-        return 'unknown'
+        return cls._FORMAT_TO_CATEGORY.get(format_name.lower(), 'unknown')
     
     @classmethod
     def is_conversion_supported(cls, source_format: str, target_format: str) -> bool:
         """Check if conversion between formats is supported"""
-        source_cat = cls.get_format_category(source_format)
-        target_cat = cls.get_format_category(target_format)
+        source_format = source_format.lower()
+        target_format = target_format.lower()
+        
+        # Pairs with a dedicated converter, including PDF to a ZIP of page images
+        if (source_format, target_format) in cls._DISPATCH:
+            return True
+        
+        source_cat = cls._FORMAT_TO_CATEGORY.get(source_format, 'unknown')
+        target_cat = cls._FORMAT_TO_CATEGORY.get(target_format, 'unknown')
         
         # Same category conversions are generally supported
         if source_cat == target_cat and source_cat != 'unknown':
             return True
         
-        # Special cross-category conversions we support
-        cross_conversions = {
-            ('image', 'document'),  # Image to PDF
-            ('document', 'image'),  # PDF to Image
-            ('video', 'audio'),     # Video to Audio
-            ('video', 'image'),     # Video to GIF
-        }
-        
-        return (source_cat, target_cat) in cross_conversions or (target_cat, source_cat) in cross_conversions
+        return (source_cat, target_cat) in cls._SUPPORTED_CROSS
     
     @classmethod
-    def convert_file(cls, input_file: BinaryIO, source_format: str, target_format: str, **options) -> bytes:
-        """Convert file from source format to target format"""
+    def convert_file(cls, input_file: Union[BinaryIO, str], source_format: str, target_format: str,
+                     **options) -> bytes:
+        """Convert file from source format to target format; the input may be an open file or a path"""
+        if isinstance(input_file, (str, os.PathLike)):
+            with open(os.fspath(input_file), 'rb') as opened_file:
+                return cls.convert_file(opened_file, source_format, target_format, **options)
+        
+        source_format = source_format.lower()
+        target_format = target_format.lower()
         
         if not cls.is_conversion_supported(source_format, target_format):
             raise Exception(f"Conversion from {source_format} to {target_format} is not supported")
         
-        # Read file content for caching
-        input_file.seek(0)
-        file_content = input_file.read()
-        input_file.seek(0)
+        # Same format with no resize or re-encode quality requested: the input
+        # already is the result, and hashing it for the cache would cost more
+        if cls._is_identity(source_format, target_format, options):
+            input_file.seek(0)
+            return input_file.read()
         
+        # Files already on disk are converted in place, and only rehashed when
+        # their stat changes
+        stat_key = cls._stat_key(input_file)
+        if stat_key is not None:
+            file_hash = cls._file_fingerprint(input_file, stat_key)
+            return cls._convert_cached(input_file, file_hash, source_format, target_format, **options)
+        
+        # Hash the upload while spooling it, so converters read the copy
+        # instead of a second full buffer on the Python heap
+        file_hash, spooled_file = cls._hash_and_spool(input_file)
+        
+        with spooled_file:
+            return cls._convert_cached(spooled_file, file_hash, source_format, target_format, **options)
+    
+    @classmethod
+    def _is_identity(cls, source_format: str, target_format: str, options: Dict[str, Any]) -> bool:
+        """Whether a conversion would return the input unchanged"""
+        aliases = cls._FORMAT_ALIASES
+        return (
+            aliases.get(source_format, source_format) == aliases.get(target_format, target_format)
+            and not options.get('max_width')
+            and not options.get('max_height')
+            and options.get('image_quality', 95) == 95
+        )
+    
+    @classmethod
+    def _convert_cached(cls, input_file: BinaryIO, file_hash: str, source_format: str, target_format: str,
+                        **options) -> bytes:
+        """Convert the input, serving and storing results in the cache by content fingerprint"""
         # Check cache first
-        cached_result = cache.get(source_format, target_format, file_content, **options)
+        cached_result = cache.get(source_format, target_format, file_hash, **options)
         if cached_result:
             return cached_result
         
-        source_cat = cls.get_format_category(source_format)
-        target_cat = cls.get_format_category(target_format)
-        
-        try:
-            converted_data = None
-            
-            # Image conversions (most reliable)
-            if source_cat == 'image' and target_cat == 'image':
-                converted_data = ImageConverter.convert_image(
-                    input_file, 
-                    source_format, 
-                    target_format,
-                    quality=options.get('image_quality', 95),
-                    max_width=options.get('max_width'),
-                    max_height=options.get('max_height')
-                )
-            
-            elif source_cat == 'image' and target_cat == 'document' and target_format.lower() == 'pdf':
-                converted_data = ImageConverter.convert_to_pdf(input_file, source_format)
-            
-            # Document conversions (reliable)
-            elif source_cat == 'document':
-                if target_format.lower() == 'txt':
-                    if source_format.lower() == 'pdf':
-                        converted_data = DocumentConverter.convert_pdf_to_text(input_file)
-                    elif source_format.lower() in ['doc', 'docx']:
-                        converted_data = DocumentConverter.convert_docx_to_txt(input_file)
-                
-                elif target_format.lower() == 'pdf':
-                    if source_format.lower() in ['doc', 'docx']:
-                        converted_data = DocumentConverter.convert_docx_to_pdf(input_file)
-                    elif source_format.lower() == 'txt':
-                        converted_data = DocumentConverter.convert_txt_to_pdf(input_file)
-                
-                elif target_format.lower() in ['doc', 'docx']:
-                    if source_format.lower() == 'pdf':
-                        converted_data = DocumentConverter.convert_pdf_to_docx(input_file)
-                
-                # PDF to image conversions
-                elif target_format.lower() in ['jpg', 'jpeg']:
-                    if source_format.lower() == 'pdf':
-                        converted_data = DocumentConverter.convert_pdf_to_jpg(input_file)
-                
-                elif target_format.lower() == 'png':
-                    if source_format.lower() == 'pdf':
-                        converted_data = DocumentConverter.convert_pdf_to_png(input_file)
-                
-                elif target_format.lower() == 'zip':
-                    if source_format.lower() == 'pdf':
-                        converted_data = DocumentConverter.convert_pdf_to_images_zip(input_file, 'png')
-                
-                # Advanced document conversions
-                elif target_format.lower() == 'pdf':
-                    if source_format.lower() == 'epub':
-                        converted_data = AdvancedDocumentConverter.convert_epub_to_pdf(input_file)
-                    elif source_format.lower() == 'mobi':
-                        converted_data = AdvancedDocumentConverter.convert_mobi_to_pdf(input_file)
-                    elif source_format.lower() == 'rtf':
-                        converted_data = AdvancedDocumentConverter.convert_rtf_to_pdf(input_file)
-                    elif source_format.lower() == 'odt':
-                        converted_data = AdvancedDocumentConverter.convert_odt_to_pdf(input_file)
-            
-            # Spreadsheet conversions (reliable)
-            elif source_cat == 'spreadsheet':
-                if target_format.lower() == 'csv':
-                    if source_format.lower() in ['xls', 'xlsx']:
-                        converted_data = DocumentConverter.convert_excel_to_csv(input_file)
-                elif target_format.lower() in ['xls', 'xlsx']:
-                    if source_format.lower() == 'csv':
-                        converted_data = DocumentConverter.convert_csv_to_excel(input_file)
-            
-            # Audio conversions (may need FFmpeg)
-            elif source_cat == 'audio' and target_cat == 'audio':
-                try:
-                    converted_data = AudioConverter.convert_audio(input_file, source_format, target_format)
-                except Exception as audio_error:
-                    # If audio conversion fails, provide helpful error
-                    raise Exception(f"Audio conversion failed (FFmpeg may be required): {str(audio_error)}")
-            
-            # Video conversions (may need FFmpeg)
-            elif source_cat == 'video':
-                try:
-                    if target_cat == 'video':
-                        converted_data = VideoConverter.convert_video(input_file, source_format, target_format)
-                    elif target_cat == 'audio':
-                        converted_data = VideoConverter.extract_audio_from_video(input_file, source_format, target_format)
-                    elif target_format.lower() == 'gif':
-                        converted_data = VideoConverter.convert_video_to_gif(input_file, source_format)
-                except Exception as video_error:
-                    # If video conversion fails, provide helpful error
-                    raise Exception(f"Video conversion failed (FFmpeg may be required): {str(video_error)}")
-            
-            else:
-                raise Exception(f"Conversion from {source_format} to {target_format} is not implemented yet")
-                
-        except Exception as e:
-            raise Exception(f"Conversion failed: {str(e)}")
+        converted_data = cls._convert(input_file, source_format, target_format, **options)
         
         # Cache the result
         try:
-            cache.set(source_format, target_format, file_content, converted_data, **options)
+            cache.set(source_format, target_format, file_hash, converted_data, **options)
         except Exception as cache_error:
             # Log cache error but don't fail the conversion
             print(f"Warning: Failed to cache conversion result: {cache_error}")
@@ -178,38 +225,111 @@ class ConversionManager:
         return converted_data
     
     @classmethod
-    def get_file_info(cls, input_file: BinaryIO, source_format: str) -> Dict[str, Any]:
-        """Get information about a file"""
+    def _convert(cls, input_file: BinaryIO, source_format: str, target_format: str, **options) -> bytes:
+        """Route a conversion to the converter that handles it; formats are already lowercase"""
+        try:
+            # Format-specific converters take just the input
+            handler = cls._DISPATCH.get((source_format, target_format))
+            if handler is not None:
+                get_converter, method_name = handler
+                return getattr(get_converter(), method_name)(input_file)
+            
+            return cls._category_dispatch(input_file, source_format, target_format, **options)
+                
+        except Exception as e:
+            raise Exception(f"Conversion failed: {str(e)}") from e
+    
+    @classmethod
+    def _category_dispatch(cls, input_file: BinaryIO, source_format: str, target_format: str, **options) -> bytes:
+        """Convert between formats that a whole category's converter handles"""
+        source_cat = cls._FORMAT_TO_CATEGORY.get(source_format, 'unknown')
+        target_cat = cls._FORMAT_TO_CATEGORY.get(target_format, 'unknown')
+        
+        # Image conversions (most reliable)
+        if source_cat == 'image' and target_cat == 'image':
+            return _image_converter().convert_image(
+                input_file, 
+                source_format, 
+                target_format,
+                quality=options.get('image_quality', 95),
+                max_width=options.get('max_width'),
+                max_height=options.get('max_height')
+            )
+        
+        if source_cat == 'image' and target_format == 'pdf':
+            return _image_converter().convert_to_pdf(input_file, source_format)
+        
+        # Audio conversions (may need FFmpeg)
+        if source_cat == 'audio' and target_cat == 'audio':
+            try:
+                return _audio_converter().convert_audio(input_file, source_format, target_format)
+            except Exception as audio_error:
+                # If audio conversion fails, provide helpful error
+                raise Exception(f"Audio conversion failed (FFmpeg may be required): {str(audio_error)}") from audio_error
+        
+        # Video conversions (may need FFmpeg)
+        if source_cat == 'video':
+            try:
+                if target_cat == 'video':
+                    return _video_converter().convert_video(input_file, source_format, target_format)
+                elif target_cat == 'audio':
+                    return _video_converter().extract_audio_from_video(input_file, source_format, target_format)
+                elif target_format == 'gif':
+                    return _video_converter().convert_video_to_gif(input_file, source_format)
+            except Exception as video_error:
+                # If video conversion fails, provide helpful error
+                raise Exception(f"Video conversion failed (FFmpeg may be required): {str(video_error)}") from video_error
+        
+        raise Exception(f"Conversion from {source_format} to {target_format} is not implemented yet")
+    
+    @classmethod
+    def get_file_info(cls, input_file: Union[BinaryIO, str], source_format: str) -> Dict[str, Any]:
+        """Get information about a file; the input may be an open file or a path"""
+        if isinstance(input_file, (str, os.PathLike)):
+            with open(os.fspath(input_file), 'rb') as opened_file:
+                return cls.get_file_info(opened_file, source_format)
+        
         source_cat = cls.get_format_category(source_format)
         
         try:
             if source_cat == 'audio':
-                return AudioConverter.get_audio_info(input_file, source_format)
+                return _audio_converter().get_audio_info(input_file, source_format)
             elif source_cat == 'video':
-                return VideoConverter.get_video_info(input_file, source_format)
+                return _video_converter().get_video_info(input_file, source_format)
             else:
-                input_file.seek(0)
-                size = len(input_file.read())
+                size = input_file.seek(0, os.SEEK_END)
                 return {'size_bytes': size, 'category': source_cat}
         except Exception as e:
             return {'error': str(e)}
     
+    @classmethod
+    def file_info_needs_probe(cls, source_format: str) -> bool:
+        """Whether get_file_info runs a media probe for this format rather than just measuring the file"""
+        return cls.get_format_category(source_format) in ('audio', 'video')
+    
     @classmethod
     def get_supported_formats(cls, source_format: str) -> list:
         """Get list of supported target formats for a given source format"""
-        source_cat = cls.get_format_category(source_format)
+        return list(cls._supported_formats(source_format.lower()))
+    
+    # Keyed by the client-supplied extension, so bounded rather than unlimited
+    @classmethod
+    @lru_cache(maxsize=128)
+    def _supported_formats(cls, source_format: str) -> Tuple[str, ...]:
+        """Sorted supported target formats for a lowercase source format, computed once per format"""
+        source_cat = cls._FORMAT_TO_CATEGORY.get(source_format, 'unknown')
         supported = []
         
         # Add all formats from same category
         if source_cat in cls.FORMAT_CATEGORIES:
-            supported.extend([f for f in cls.FORMAT_CATEGORIES[source_cat] if f != source_format.lower()])
+            supported.extend([f for f in cls.FORMAT_CATEGORIES[source_cat] if f != source_format])
         
         # Add cross-category conversions
         if source_cat == 'image':
             supported.append('pdf')
         elif source_cat == 'video':
             supported.extend(['mp3', 'wav', 'aac', 'gif'])
-        elif source_cat == 'document' and source_format.lower() == 'pdf':
+        elif source_cat == 'document' and source_format == 'pdf':
             supported.extend(['jpg', 'png', 'zip'])
         
-        return sorted(list(set(supported)))
\ No newline at end of file
+        return tuple(sorted(set(supported)))
\ No newline at end of file
@@ -1,50 +1,236 @@
 import os
 import io
+import math
 import tempfile
-from typing import BinaryIO
-from PyPDF2 import PdfReader, PdfWriter
+from functools import lru_cache
+from typing import TYPE_CHECKING, Iterator, List
 from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-from docx import Document
-from docx.shared import Inches
-import openpyxl
-from openpyxl.utils import get_column_letter
+from reportlab.lib.pagesizes import letter, A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
+from reportlab.pdfbase.pdfmetrics import stringWidth
 import csv
-from pptx import Presentation
-from PIL import Image
-import fitz  # PyMuPDF for PDF to image conversion
+from PIL import Image, ImageDraw, ImageFont
+import zipfile
+from .tempdir import TEMP_DIR
+from .streams import InputData, as_buffer, as_stream, copy_to_file
+
+if TYPE_CHECKING:
+    import fitz
+
+# PyMuPDF, python-docx, openpyxl and PyPDF2 each take 100-300 ms to import and
+# most routes need at most one of them, so each is imported on first use
+@lru_cache(maxsize=None)
+def _fitz():
+    import fitz  # PyMuPDF
+    return fitz
+
+@lru_cache(maxsize=None)
+def _docx_document():
+    from docx import Document
+    return Document
+
+@lru_cache(maxsize=None)
+def _openpyxl():
+    import openpyxl
+    return openpyxl
+
+@lru_cache(maxsize=None)
+def _pdf_reader():
+    from PyPDF2 import PdfReader
+    return PdfReader
+
+# docx2pdf drives a local Word install; without it DOCX falls back to ReportLab
+try:
+    from docx2pdf import convert as docx2pdf_convert
+    _HAVE_DOCX2PDF = True
+except ImportError:
+    _HAVE_DOCX2PDF = False
+
+# Plain-text PDF layout: ReportLab's default canvas font with 15pt line spacing
+_TXT_FONT_NAME = 'Helvetica'
+_TXT_FONT_SIZE = 12
+_TXT_LEADING = 15
+
+# DOCX -> PDF styles; Platypus only reads them, so every conversion shares one set
+_STYLES = getSampleStyleSheet()
+
+_DOCX_TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_STYLES['Heading1'],
+    fontSize=16,
+    spaceAfter=12,
+    alignment=TA_CENTER
+)
+
+_DOCX_HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=_STYLES['Heading2'],
+    fontSize=14,
+    spaceAfter=8,
+    alignment=TA_LEFT
+)
+
+_DOCX_NORMAL_STYLE = ParagraphStyle(
+    'CustomNormal',
+    parent=_STYLES['Normal'],
+    fontSize=11,
+    spaceAfter=6,
+    alignment=TA_JUSTIFY
+)
+
+_DOCX_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+    ('GRID', (0, 0), (-1, -1), 1, colors.black)
+])
+
+def _txt_width(text: str) -> float:
+    """Width of text in the TXT -> PDF body font"""
+    return stringWidth(text, _TXT_FONT_NAME, _TXT_FONT_SIZE)
+
+def _wrap_line(line: str, max_width: float, word_widths: dict, measure=_txt_width) -> list:
+    """Greedily wrap a line at word boundaries, measuring each distinct word only once"""
+    space_width = measure(' ')
+    wrapped_lines = []
+    current_words = []
+    current_width = 0
+    
+    for word in line.split():
+        width = word_widths.get(word)
+        if width is None:
+            width = word_widths[word] = measure(word)
+        
+        if current_words and current_width + space_width + width > max_width:
+            wrapped_lines.append(' '.join(current_words))
+            current_words = [word]
+            current_width = width
+        else:
+            current_width += width + (space_width if current_words else 0)
+            current_words.append(word)
+    
+    if current_words:
+        wrapped_lines.append(' '.join(current_words))
+    return wrapped_lines
+
+def _extract_page_texts(pdf_data: bytes) -> List[str]:
+    """Extract the text of every page"""
+    try:
+        return _read_page_texts(pdf_data)
+    except Exception:
+        # MuPDF rejects some damaged files that PyPDF2's lenient parser can still read
+        reader = _pdf_reader()(io.BytesIO(pdf_data))
+        return [page.extract_text() or "" for page in reader.pages]
+
+def _read_page_texts(pdf_data: bytes) -> List[str]:
+    """Extract the text of every page with PyMuPDF"""
+    with _fitz().open(stream=pdf_data, filetype="pdf") as pdf_document:
+        return [page.get_text() for page in pdf_document]
+
+@lru_cache(maxsize=None)
+def _fallback_font(size: int):
+    """Load the PDF -> image fallback font once per size instead of parsing the TTF per call"""
+    try:
+        return ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", size)
+    except OSError:
+        return ImageFont.load_default()
+
+# Pages render at 2x zoom for lossless PNG output and 1.5x for JPEG, whose
+# artifacts hide the difference at a bit over half the pixels. Either is scaled
+# down when a page is so large that its pixmap would exceed _MAX_PAGE_PIXELS.
+_RENDER_ZOOM = 2.0
+_JPEG_RENDER_ZOOM = 1.5
+_MAX_PAGE_PIXELS = 16_000_000
+
+_JPEG_FORMATS = frozenset({'jpg', 'jpeg'})
+
+def _default_zoom(target_format: str) -> float:
+    """Render zoom used when the caller does not ask for one"""
+    return _JPEG_RENDER_ZOOM if target_format in _JPEG_FORMATS else _RENDER_ZOOM
+
+def _page_matrix(page, zoom: float) -> "fitz.Matrix":
+    """Zoom matrix for rendering a page, capped so oversized pages stay within _MAX_PAGE_PIXELS"""
+    rect = page.rect
+    zoom = min(zoom, math.sqrt(_MAX_PAGE_PIXELS / max(rect.width * rect.height, 1)))
+    return _fitz().Matrix(zoom, zoom)
+
+def _render_page(page, zoom: float) -> "fitz.Pixmap":
+    """Render a page to an opaque RGB pixmap, the layout the combined canvas and encoders expect"""
+    return page.get_pixmap(matrix=_page_matrix(page, zoom), colorspace=_fitz().csRGB, alpha=False)
+
+def _pixmap_to_image(pix) -> Image.Image:
+    """Wrap a rendered PyMuPDF pixmap as a PIL image without encoding it first"""
+    mode = "RGBA" if pix.alpha else "RGB"
+    # samples_mv is a view of the pixmap buffer, so PIL copies it once instead of twice
+    return Image.frombytes(mode, (pix.width, pix.height), pix.samples_mv)
+
+def _encode_pixmap(pix, target_format: str) -> bytes:
+    """Encode a rendered pixmap as a JPG/PNG image"""
+    if target_format not in _JPEG_FORMATS:
+        # MuPDF encodes the pixmap itself, faster and smaller than going through PIL
+        return pix.tobytes("png")
+    
+    page_image = _pixmap_to_image(pix)
+    if page_image.mode in ['RGBA', 'LA']:
+        background = Image.new('RGB', page_image.size, (255, 255, 255))
+        if page_image.mode == 'RGBA':
+            background.paste(page_image, mask=page_image)
+        else:
+            background.paste(page_image)
+        page_image = background
+    elif page_image.mode != 'RGB':
+        page_image = page_image.convert('RGB')
+    
+    img_buffer = io.BytesIO()
+    page_image.save(img_buffer, format='JPEG', quality=95, optimize=True)
+    return img_buffer.getvalue()
+
+def _encode_page(page, target_format: str, zoom: float) -> bytes:
+    """Render a PDF page and encode it as a standalone JPG/PNG image"""
+    return _encode_pixmap(_render_page(page, zoom), target_format)
+
+def _encoded_pages(pdf_data: bytes, target_format: str, zoom: float) -> Iterator[bytes]:
+    """Yield every page as encoded image bytes in order, rendering one page at a time"""
+    with _fitz().open(stream=pdf_data, filetype="pdf") as pdf_document:
+        if len(pdf_document) == 0:
+            raise Exception("PDF has no pages")
+        for page in pdf_document:
+            yield _encode_page(page, target_format, zoom)
 
 class DocumentConverter:
     @staticmethod
-    def convert_pdf_to_text(input_file: BinaryIO) -> bytes:
+    def convert_pdf_to_text(input_file: InputData) -> bytes:
         """Convert PDF to plain text"""
         try:
-            input_file.seek(0)
-            reader = PdfReader(input_file)
-            text_content = ""
-            
-            for page in reader.pages:
-                text_content += page.extract_text() + "\n\n"
-            
-            return text_content.encode('utf-8')
+            # Encode page by page and join the bytes once, so the full text is
+            # never held as a str and an encoded copy at the same time
+            parts = []
+            for text in _extract_page_texts(as_buffer(input_file)):
+                parts.append(text.encode('utf-8'))
+                parts.append(b"\n\n")
+            
+            return b"".join(parts)
         except Exception as e:
-            raise Exception(f"PDF to text conversion failed: {str(e)}")
+            raise Exception(f"PDF to text conversion failed: {str(e)}") from e
     
     @staticmethod
-    def convert_pdf_to_docx(input_file: BinaryIO) -> bytes:
+    def convert_pdf_to_docx(input_file: InputData) -> bytes:
         """Convert PDF to DOCX"""
         try:
-            input_file.seek(0)
-            reader = PdfReader(input_file)
-            
             # Create new document
-            doc = Document()
+            doc = _docx_document()()
             
-            for page_num, page in enumerate(reader.pages):
+            for page_num, text in enumerate(_extract_page_texts(as_buffer(input_file))):
                 if page_num > 0:
                     doc.add_page_break()
                 
-                text = page.extract_text()
                 doc.add_paragraph(text)
             
             output_buffer = io.BytesIO()
@@ -52,102 +238,58 @@ class DocumentConverter:
             
             return output_buffer.getvalue()
         except Exception as e:
-            raise Exception(f"PDF to DOCX conversion failed: {str(e)}")
+            raise Exception(f"PDF to DOCX conversion failed: {str(e)}") from e
     
     @staticmethod
-    def convert_docx_to_pdf(input_file: BinaryIO) -> bytes:
+    def convert_docx_to_pdf(input_file: InputData) -> bytes:
         """Convert DOCX to PDF with advanced formatting preservation"""
         try:
-            # Try using python-docx2pdf first (better formatting preservation)
+            if not _HAVE_DOCX2PDF:
+                # Fallback to advanced reportlab conversion
+                return DocumentConverter._convert_docx_to_pdf_advanced(input_file)
+            
+            # Use docx2pdf when available (better formatting preservation)
+            # Create temporary files
+            with tempfile.NamedTemporaryFile(suffix='.docx', delete=False, dir=TEMP_DIR) as temp_docx:
+                copy_to_file(input_file, temp_docx)
+                temp_docx_path = temp_docx.name
+            
+            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False, dir=TEMP_DIR) as temp_pdf:
+                temp_pdf_path = temp_pdf.name
+            
             try:
-                from docx2pdf import convert
-                import tempfile
-                import os
-                
-                input_file.seek(0)
+                # Convert using docx2pdf (preserves formatting better)
+                docx2pdf_convert(temp_docx_path, temp_pdf_path)
                 
-                # Create temporary files
-                with tempfile.NamedTemporaryFile(suffix='.docx', delete=False) as temp_docx:
-                    temp_docx.write(input_file.read())
-                    temp_docx_path = temp_docx.name
+                # Read the converted PDF
+                with open(temp_pdf_path, 'rb') as pdf_file:
+                    pdf_content = pdf_file.read()
                 
-                with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_pdf:
-                    temp_pdf_path = temp_pdf.name
+                return pdf_content
                 
-                try:
-                    # Convert using docx2pdf (preserves formatting better)
-                    convert(temp_docx_path, temp_pdf_path)
-                    
-                    # Read the converted PDF
-                    with open(temp_pdf_path, 'rb') as pdf_file:
-                        pdf_content = pdf_file.read()
-                    
-                    return pdf_content
-                    
-                finally:
-                    # Clean up temporary files
-                    for path in [temp_docx_path, temp_pdf_path]:
-                        if os.path.exists(path):
-                            os.unlink(path)
-                            
-            except ImportError:
-                # Fallback to advanced reportlab conversion
-                return DocumentConverter._convert_docx_to_pdf_advanced(input_file)
+            finally:
+                # Clean up temporary files
+                for path in [temp_docx_path, temp_pdf_path]:
+                    if os.path.exists(path):
+                        os.unlink(path)
                 
         except Exception as e:
-            raise Exception(f"DOCX to PDF conversion failed: {str(e)}")
+            raise Exception(f"DOCX to PDF conversion failed: {str(e)}") from e
     
     @staticmethod
-    def _convert_docx_to_pdf_advanced(input_file: BinaryIO) -> bytes:
+    def _convert_docx_to_pdf_advanced(input_file: InputData) -> bytes:
         """Advanced DOCX to PDF conversion with better formatting preservation"""
         try:
-            from reportlab.pdfgen import canvas
-            from reportlab.lib.pagesizes import letter, A4
-            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Image as RLImage
-            from reportlab.lib.units import inch
-            from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT, TA_JUSTIFY
-            from docx.shared import Inches
-            import tempfile
-            import os
-            
-            input_file.seek(0)
-            doc = Document(input_file)
+            doc = _docx_document()(as_stream(input_file))
             
             output_buffer = io.BytesIO()
             doc_pdf = SimpleDocTemplate(output_buffer, pagesize=A4, 
                                       rightMargin=72, leftMargin=72, 
                                       topMargin=72, bottomMargin=18)
             
-            # Define styles
-            styles = getSampleStyleSheet()
-            
-            # Create custom styles based on document formatting
-            title_style = ParagraphStyle(
-                'CustomTitle',
-                parent=styles['Heading1'],
-                fontSize=16,
-                spaceAfter=12,
-                alignment=TA_CENTER
-            )
-            
-            heading_style = ParagraphStyle(
-                'CustomHeading',
-                parent=styles['Heading2'],
-                fontSize=14,
-                spaceAfter=8,
-                alignment=TA_LEFT
-            )
-            
-            normal_style = ParagraphStyle(
-                'CustomNormal',
-                parent=styles['Normal'],
-                fontSize=11,
-                spaceAfter=6,
-                alignment=TA_JUSTIFY
-            )
-            
-            # Build content
+            # Build content. Styles are shared module constants, but Spacers stay
+            # per-paragraph: Platypus shrinks them in place at frame breaks, so a
+            # shared instance corrupts the layout of later pages
             story = []
             
             for paragraph in doc.paragraphs:
@@ -158,33 +300,30 @@ class DocumentConverter:
                 
                 # Determine style based on paragraph properties
                 if paragraph.style.name.startswith('Title'):
-                    story.append(Paragraph(text, title_style))
+                    story.append(Paragraph(text, _DOCX_TITLE_STYLE))
                 elif paragraph.style.name.startswith('Heading'):
-                    story.append(Paragraph(text, heading_style))
+                    story.append(Paragraph(text, _DOCX_HEADING_STYLE))
                 else:
                     # Check for bold/italic formatting
                     if paragraph.runs:
-                        formatted_text = ""
+                        formatted_runs = []
                         for run in paragraph.runs:
                             if run.bold and run.italic:
-                                formatted_text += f"<b><i>{run.text}</i></b>"
+                                formatted_runs.append(f"<b><i>{run.text}</i></b>")
                             elif run.bold:
-                                formatted_text += f"<b>{run.text}</b>"
+                                formatted_runs.append(f"<b>{run.text}</b>")
                             elif run.italic:
-                                formatted_text += f"<i>{run.text}</i>"
+                                formatted_runs.append(f"<i>{run.text}</i>")
                             else:
-                                formatted_text += run.text
-                        story.append(Paragraph(formatted_text, normal_style))
+                                formatted_runs.append(run.text)
+                        story.append(Paragraph("".join(formatted_runs), _DOCX_NORMAL_STYLE))
                     else:
-                        story.append(Paragraph(text, normal_style))
+                        story.append(Paragraph(text, _DOCX_NORMAL_STYLE))
                 
                 story.append(Spacer(1, 6))
             
             # Handle tables
             for table in doc.tables:
-                from reportlab.platypus import Table, TableStyle
-                from reportlab.lib import colors
-                
                 table_data = []
                 for row in table.rows:
                     row_data = []
@@ -194,16 +333,7 @@ class DocumentConverter:
                 
                 if table_data:
                     table_obj = Table(table_data)
-                    table_obj.setStyle(TableStyle([
-                        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                        ('FONTSIZE', (0, 0), (-1, 0), 10),
-                        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                        ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                        ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                    ]))
+                    table_obj.setStyle(_DOCX_TABLE_STYLE)
                     story.append(table_obj)
                     story.append(Spacer(1, 12))
             
@@ -212,201 +342,168 @@ class DocumentConverter:
             return output_buffer.getvalue()
             
         except Exception as e:
-            raise Exception(f"Advanced DOCX to PDF conversion failed: {str(e)}")
+            raise Exception(f"Advanced DOCX to PDF conversion failed: {str(e)}") from e
     
     @staticmethod
-    def convert_docx_to_txt(input_file: BinaryIO) -> bytes:
+    def convert_docx_to_txt(input_file: InputData) -> bytes:
         """Convert DOCX to plain text"""
         try:
-            input_file.seek(0)
-            doc = Document(input_file)
-            
-            text_content = ""
-            for paragraph in doc.paragraphs:
-                text_content += paragraph.text + "\n"
+            doc = _docx_document()(as_stream(input_file))
             
-            return text_content.encode('utf-8')
+            return b"".join((paragraph.text + "\n").encode('utf-8') for paragraph in doc.paragraphs)
         except Exception as e:
-            raise Exception(f"DOCX to text conversion failed: {str(e)}")
+            raise Exception(f"DOCX to text conversion failed: {str(e)}") from e
     
     @staticmethod
-    def convert_txt_to_pdf(input_file: BinaryIO) -> bytes:
+    def convert_txt_to_pdf(input_file: InputData) -> bytes:
         """Convert plain text to PDF"""
         try:
-            input_file.seek(0)
-            text_content = input_file.read().decode('utf-8')
-            
             output_buffer = io.BytesIO()
             c = canvas.Canvas(output_buffer, pagesize=letter)
             width, height = letter
-            
-            lines = text_content.split('\n')
-            y = height - 50
-            
-            for line in lines:
-                if y < 50:  # Start new page
-                    c.showPage()
-                    y = height - 50
-                
-                # Handle long lines
-                if len(line) * 6 > width - 100:
-                    words = line.split()
-                    current_line = ""
-                    for word in words:
-                        test_line = current_line + word + " "
-                        if len(test_line) * 6 > width - 100:
-                            if current_line:
-                                c.drawString(50, y, current_line.strip())
-                                y -= 15
-                                current_line = word + " "
-                            else:
-                                c.drawString(50, y, word)
-                                y -= 15
-                        else:
-                            current_line = test_line
+            max_width = width - 100
+            top = height - 50
+            
+            def new_page_text():
+                text = c.beginText(50, top)
+                text.setFont(_TXT_FONT_NAME, _TXT_FONT_SIZE, _TXT_LEADING)
+                return text
+            
+            # Emit each page as one text object, wrapping long lines with real
+            # font metrics instead of a fixed per-character width
+            text = new_page_text()
+            y = top
+            word_widths = {}
+            
+            # Decode line by line off the stream instead of holding the whole text
+            text_lines = io.TextIOWrapper(as_stream(input_file), encoding='utf-8')
+            try:
+                for line in text_lines:
+                    line = line.rstrip('\n')
                     
-                    if current_line.strip():
-                        c.drawString(50, y, current_line.strip())
-                        y -= 15
-                else:
-                    c.drawString(50, y, line)
-                    y -= 15
-            
+                    # Short lines keep their indentation; long ones wrap at spaces
+                    if stringWidth(line, _TXT_FONT_NAME, _TXT_FONT_SIZE) <= max_width:
+                        wrapped_lines = [line]
+                    else:
+                        wrapped_lines = _wrap_line(line, max_width, word_widths)
+                    
+                    for wrapped_line in wrapped_lines:
+                        if y < 50:  # Start new page
+                            c.drawText(text)
+                            c.showPage()
+                            text = new_page_text()
+                            y = top
+                        text.textLine(wrapped_line)
+                        y -= _TXT_LEADING
+            finally:
+                # Don't let the wrapper close the caller's file
+                text_lines.detach()
+            
+            c.drawText(text)
             c.save()
             return output_buffer.getvalue()
         except Exception as e:
-            raise Exception(f"Text to PDF conversion failed: {str(e)}")
+            raise Exception(f"Text to PDF conversion failed: {str(e)}") from e
     
     @staticmethod
-    def convert_excel_to_csv(input_file: BinaryIO) -> bytes:
+    def convert_excel_to_csv(input_file: InputData) -> bytes:
         """Convert Excel to CSV"""
         try:
-            input_file.seek(0)
-            workbook = openpyxl.load_workbook(input_file)
-            worksheet = workbook.active
-            
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            for row in worksheet.iter_rows(values_only=True):
-                # Convert None values to empty strings
-                clean_row = [str(cell) if cell is not None else '' for cell in row]
-                writer.writerow(clean_row)
+            # Stream rows out of the sheet XML instead of building every Cell object
+            workbook = _openpyxl().load_workbook(as_stream(input_file), read_only=True, data_only=True)
+            try:
+                worksheet = workbook.active
+                
+                # Encode into the output buffer as rows are written, instead of
+                # building the whole CSV as a str and encoding a second copy
+                output_buffer = io.BytesIO()
+                output = io.TextIOWrapper(output_buffer, encoding='utf-8', newline='', write_through=True)
+                writer = csv.writer(output)
+                
+                # Hand the rows to the C writer in one call; it already writes None as ''
+                writer.writerows(worksheet.iter_rows(values_only=True))
+                output.flush()
+                output.detach()
+            finally:
+                workbook.close()
             
-            return output.getvalue().encode('utf-8')
+            return output_buffer.getvalue()
         except Exception as e:
-            raise Exception(f"Excel to CSV conversion failed: {str(e)}")
+            raise Exception(f"Excel to CSV conversion failed: {str(e)}") from e
     
     @staticmethod
-    def convert_csv_to_excel(input_file: BinaryIO) -> bytes:
+    def convert_csv_to_excel(input_file: InputData) -> bytes:
         """Convert CSV to Excel"""
         try:
-            input_file.seek(0)
-            csv_content = input_file.read().decode('utf-8')
+            # Rows are serialized as they're appended rather than kept as Cell objects
+            workbook = _openpyxl().Workbook(write_only=True)
+            worksheet = workbook.create_sheet()
             
-            workbook = openpyxl.Workbook()
-            worksheet = workbook.active
-            
-            # Parse CSV
-            csv_reader = csv.reader(io.StringIO(csv_content))
-            for row_num, row in enumerate(csv_reader, 1):
-                for col_num, value in enumerate(row, 1):
-                    worksheet.cell(row=row_num, column=col_num, value=value)
+            # Parse the CSV straight off the stream and append whole rows
+            csv_text = io.TextIOWrapper(as_stream(input_file), encoding='utf-8', newline='')
+            try:
+                for row in csv.reader(csv_text):
+                    worksheet.append(row)
+            finally:
+                # Don't let the wrapper close the caller's file
+                csv_text.detach()
             
             output_buffer = io.BytesIO()
             workbook.save(output_buffer)
             
             return output_buffer.getvalue()
         except Exception as e:
-            raise Exception(f"CSV to Excel conversion failed: {str(e)}")
+            raise Exception(f"CSV to Excel conversion failed: {str(e)}") from e
     
     @staticmethod
-    def convert_pdf_to_image(input_file: BinaryIO, target_format: str = 'png') -> bytes:
+    def convert_pdf_to_image(input_file: InputData, target_format: str = 'png', zoom: float = None) -> bytes:
         """Convert PDF to image (JPG/PNG) - supports multi-page PDFs by creating a combined image"""
+        target_format = target_format.lower()
+        zoom = zoom or _default_zoom(target_format)
         try:
+            # Both the renderer and the fallback parse the same in-memory copy
+            pdf_data = as_buffer(input_file)
+            
             # Try using PyMuPDF (fitz) first - better for PDF to image conversion
             try:
-                import fitz  # PyMuPDF
-                from PIL import Image
-                
-                input_file.seek(0)
-                pdf_data = input_file.read()
-                
                 # Open PDF with PyMuPDF
-                pdf_document = fitz.open(stream=pdf_data, filetype="pdf")
+                pdf_document = _fitz().open(stream=pdf_data, filetype="pdf")
                 
                 # Get all pages
                 num_pages = len(pdf_document)
                 if num_pages == 0:
                     raise Exception("PDF has no pages")
                 
-                # For single page, convert directly
+                # Render every page up front so the combined canvas is allocated once at its final size
+                pixmaps = [_render_page(page, zoom) for page in pdf_document]
+                
                 if num_pages == 1:
-                    page = pdf_document[0]
-                    mat = fitz.Matrix(2.0, 2.0)  # 2x zoom for better quality
-                    pix = page.get_pixmap(matrix=mat)
-                    img_data = pix.tobytes("png")
-                    image = Image.open(io.BytesIO(img_data))
+                    combined = pixmaps[0]
                 else:
-                    # For multi-page PDFs, create a combined image
-                    images = []
-                    max_width = 0
-                    total_height = 0
-                    
-                    for page_num in range(num_pages):
-                        page = pdf_document[page_num]
-                        mat = fitz.Matrix(2.0, 2.0)  # 2x zoom for better quality
-                        pix = page.get_pixmap(matrix=mat)
-                        img_data = pix.tobytes("png")
-                        page_image = Image.open(io.BytesIO(img_data))
-                        images.append(page_image)
-                        
-                        max_width = max(max_width, page_image.width)
-                        total_height += page_image.height
-                    
-                    # Create combined image
-                    combined_image = Image.new('RGB', (max_width, total_height), 'white')
+                    # For multi-page PDFs, stack the pages on one white canvas in
+                    # MuPDF so PNG output never has to go through PIL
+                    max_width = max(pix.width for pix in pixmaps)
+                    total_height = sum(pix.height for pix in pixmaps)
+                    fitz = _fitz()
+                    combined = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, max_width, total_height), False)
+                    combined.clear_with(255)
                     y_offset = 0
                     
-                    for page_image in images:
+                    for pix in pixmaps:
                         # Center the page image if it's narrower than max_width
-                        x_offset = (max_width - page_image.width) // 2
-                        combined_image.paste(page_image, (x_offset, y_offset))
-                        y_offset += page_image.height
-                    
-                    image = combined_image
+                        pix.set_origin((max_width - pix.width) // 2, y_offset)
+                        combined.copy(pix, pix.irect)
+                        y_offset += pix.height
                 
                 # Convert to target format
-                output_buffer = io.BytesIO()
-                
-                if target_format.lower() in ['jpg', 'jpeg']:
-                    # Convert to RGB for JPEG (remove alpha channel)
-                    if image.mode in ['RGBA', 'LA']:
-                        background = Image.new('RGB', image.size, (255, 255, 255))
-                        if image.mode == 'RGBA':
-                            background.paste(image, mask=image.split()[-1])
-                        else:
-                            background.paste(image)
-                        image = background
-                    elif image.mode != 'RGB':
-                        image = image.convert('RGB')
-                    
-                    image.save(output_buffer, format='JPEG', quality=95, optimize=True)
-                else:  # PNG
-                    if image.mode != 'RGBA':
-                        image = image.convert('RGBA')
-                    image.save(output_buffer, format='PNG', optimize=True)
-                
+                image_data = _encode_pixmap(combined, target_format)
                 pdf_document.close()
-                return output_buffer.getvalue()
+                return image_data
                 
             except (ImportError, Exception) as e:
                 # Fallback: Use reportlab to create a simple image representation
                 # This is a basic fallback - not ideal but better than nothing
-                from PIL import Image, ImageDraw, ImageFont
-                
-                input_file.seek(0)
-                reader = PdfReader(input_file)
+                reader = _pdf_reader()(io.BytesIO(pdf_data))
                 
                 # Extract text from first page
                 first_page = reader.pages[0]
@@ -418,41 +515,21 @@ class DocumentConverter:
                 image = Image.new('RGB', (img_width, img_height), 'white')
                 draw = ImageDraw.Draw(image)
                 
-                # Try to use a default font
-                try:
-                    font = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 12)
-                except:
-                    font = ImageFont.load_default()
+                font = _fallback_font(12)
                 
-                # Draw text on image (simple word wrapping)
+                # Draw text on image, wrapping with cached per-word widths rather
+                # than measuring every growing candidate line
                 y_position = 50
-                words = text_content.split()
-                line = ""
-                
-                for word in words:
-                    test_line = line + word + " "
-                    bbox = draw.textbbox((0, 0), test_line, font=font)
-                    if bbox[2] > img_width - 100:  # Line too long
-                        if line:
-                            draw.text((50, y_position), line.strip(), fill='black', font=font)
-                            y_position += 20
-                            line = word + " "
-                        else:
-                            draw.text((50, y_position), word, fill='black', font=font)
-                            y_position += 20
-                    else:
-                        line = test_line
-                    
+                for line in _wrap_line(text_content or "", img_width - 100, {}, font.getlength):
                     if y_position > img_height - 100:  # Image full
                         break
-                
-                if line.strip():
-                    draw.text((50, y_position), line.strip(), fill='black', font=font)
+                    draw.text((50, y_position), line, fill='black', font=font)
+                    y_position += 20
                 
                 # Save as target format
                 output_buffer = io.BytesIO()
                 
-                if target_format.lower() in ['jpg', 'jpeg']:
+                if target_format in _JPEG_FORMATS:
                     image.save(output_buffer, format='JPEG', quality=95)
                 else:  # PNG
                     image.save(output_buffer, format='PNG')
@@ -460,73 +537,36 @@ class DocumentConverter:
                 return output_buffer.getvalue()
                 
         except Exception as e:
-            raise Exception(f"PDF to image conversion failed: {str(e)}")
+            raise Exception(f"PDF to image conversion failed: {str(e)}") from e
     
     @staticmethod
-    def convert_pdf_to_jpg(input_file: BinaryIO) -> bytes:
+    def convert_pdf_to_jpg(input_file: InputData) -> bytes:
         """Convert PDF to JPG"""
         return DocumentConverter.convert_pdf_to_image(input_file, 'jpg')
     
     @staticmethod
-    def convert_pdf_to_png(input_file: BinaryIO) -> bytes:
+    def convert_pdf_to_png(input_file: InputData) -> bytes:
         """Convert PDF to PNG"""
         return DocumentConverter.convert_pdf_to_image(input_file, 'png')
     
     @staticmethod
-    def convert_pdf_to_images_zip(input_file: BinaryIO, target_format: str = 'png') -> bytes:
+    def convert_pdf_to_images_zip(input_file: InputData, target_format: str = 'png', zoom: float = None) -> bytes:
         """Convert PDF to ZIP file containing individual page images"""
+        target_format = target_format.lower()
+        zoom = zoom or _default_zoom(target_format)
         try:
-            import fitz  # PyMuPDF
-            from PIL import Image
-            import zipfile
-            
-            input_file.seek(0)
-            pdf_data = input_file.read()
-            
-            # Open PDF with PyMuPDF
-            pdf_document = fitz.open(stream=pdf_data, filetype="pdf")
-            num_pages = len(pdf_document)
-            
-            if num_pages == 0:
-                raise Exception("PDF has no pages")
+            pdf_data = as_buffer(input_file)
             
             # Create ZIP file in memory
             zip_buffer = io.BytesIO()
             
-            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-                for page_num in range(num_pages):
-                    page = pdf_document[page_num]
-                    mat = fitz.Matrix(2.0, 2.0)  # 2x zoom for better quality
-                    pix = page.get_pixmap(matrix=mat)
-                    img_data = pix.tobytes("png")
-                    page_image = Image.open(io.BytesIO(img_data))
-                    
-                    # Convert to target format
-                    img_buffer = io.BytesIO()
-                    
-                    if target_format.lower() in ['jpg', 'jpeg']:
-                        if page_image.mode in ['RGBA', 'LA']:
-                            background = Image.new('RGB', page_image.size, (255, 255, 255))
-                            if page_image.mode == 'RGBA':
-                                background.paste(page_image, mask=page_image.split()[-1])
-                            else:
-                                background.paste(page_image)
-                            page_image = background
-                        elif page_image.mode != 'RGB':
-                            page_image = page_image.convert('RGB')
-                        
-                        page_image.save(img_buffer, format='JPEG', quality=95, optimize=True)
-                    else:  # PNG
-                        if page_image.mode != 'RGBA':
-                            page_image = page_image.convert('RGBA')
-                        page_image.save(img_buffer, format='PNG', optimize=True)
-                    
-                    # Add to ZIP
-                    filename = f"page_{page_num + 1}.{target_format.lower()}"
-                    zip_file.writestr(filename, img_buffer.getvalue())
+            # Page images are already compressed, so store them rather than deflating again
+            with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_STORED) as zip_file:
+                for page_num, img_data in enumerate(_encoded_pages(pdf_data, target_format, zoom)):
+                    filename = f"page_{page_num + 1}.{target_format}"
+                    zip_file.writestr(filename, img_data)
             
-            pdf_document.close()
             return zip_buffer.getvalue()
             
         except Exception as e:
-            raise Exception(f"PDF to images ZIP conversion failed: {str(e)}")
\ No newline at end of file
+            raise Exception(f"PDF to images ZIP conversion failed: {str(e)}") from e
\ No newline at end of file
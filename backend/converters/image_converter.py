@@ -1,8 +1,6 @@
 import os
 import tempfile
 from PIL import Image, ImageDraw, ImageFont, ImageOps
-import cv2
-import numpy as np
 from typing import BinaryIO
 import io
 import base64
@@ -26,7 +24,7 @@ class ImageConverter:
                 # Create white background
                 background = Image.new('RGB', image.size, (255, 255, 255))
                 if image.mode == 'RGBA':
-                    background.paste(image, mask=image.split()[-1])  # Use alpha channel as mask
+                    background.paste(image, mask=image)  # Use alpha channel as mask
                 else:
                     background.paste(image)
                 image = background
@@ -46,6 +44,14 @@ class ImageConverter:
             if target_format.upper() == 'ICO':
                 # ICO format requires specific sizes
                 sizes = [(16, 16), (32, 32), (48, 48), (64, 64), (128, 128), (256, 256)]
+                
+                # The ICO writer resamples every icon from the full image, so shrink
+                # large images once until the short side just covers the 256px icon
+                scale = 256 / min(image.size)
+                if scale < 1:
+                    image = image.resize((max(256, round(image.width * scale)), max(256, round(image.height * scale))),
+                                         Image.Resampling.LANCZOS, reducing_gap=3.0)
+                
                 image.save(output_buffer, format='ICO', sizes=sizes)
             elif target_format.upper() == 'SVG':
                 # For SVG conversion, we'll create a simple SVG with base64 embedded image
@@ -100,7 +106,7 @@ class ImageConverter:
             return output_buffer.getvalue()
             
         except Exception as e:
-            raise Exception(f"Image conversion failed: {str(e)}")
+            raise Exception(f"Image conversion failed: {str(e)}") from e
     
     @staticmethod
     def _resize_image(image: Image.Image, max_width: int = None, max_height: int = None) -> Image.Image:
@@ -146,4 +152,4 @@ class ImageConverter:
             return output_buffer.getvalue()
             
         except Exception as e:
-            raise Exception(f"Image to PDF conversion failed: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Image to PDF conversion failed: {str(e)}") from e
\ No newline at end of file
@@ -0,0 +1,44 @@
+import os
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+# Forking a server that already runs an event loop and threads can copy held
+# locks into the child, so workers start from a clean forkserver (or spawn
+# where that isn't available) instead
+_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+
+def get_pool() -> ProcessPoolExecutor:
+    """Get the shared process pool conversions run in, starting it on first use"""
+    global _POOL
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = ProcessPoolExecutor(
+                    max_workers=os.cpu_count(),
+                    mp_context=multiprocessing.get_context(_START_METHOD),
+                )
+    return _POOL
+
+def reset_pool(broken: ProcessPoolExecutor):
+    """Discard a pool that lost a worker, so the next get_pool() starts a fresh one.
+    
+    Another caller may already have replaced it, in which case the current pool is kept.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is broken:
+            _POOL = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_pool():
+    """Stop the shared pool's workers, if it was ever started"""
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,69 @@
+import io
+import mmap
+import os
+import shutil
+import tempfile
+from typing import BinaryIO, Optional, Union
+
+# Converter inputs: an open binary stream or an in-memory buffer
+InputData = Union[BinaryIO, bytes, bytearray, memoryview]
+
+_BUFFER_TYPES = (bytes, bytearray, memoryview)
+
+# Chunk size for copying streams into temporary files
+_COPY_BUFFER_SIZE = 1 << 20
+
+def as_bytes(input_data: InputData) -> Union[bytes, bytearray, memoryview]:
+    """Get the input's content, reading streams from the start and passing buffers through uncopied"""
+    if isinstance(input_data, _BUFFER_TYPES):
+        return input_data
+    input_data.seek(0)
+    return input_data.read()
+
+def as_buffer(input_data: InputData) -> Union[bytes, bytearray, memoryview]:
+    """Get the input's content without copying it where possible: buffers pass
+    through, in-memory streams share their bytes and on-disk files are memory-mapped"""
+    if isinstance(input_data, _BUFFER_TYPES):
+        return input_data
+    
+    if isinstance(input_data, io.BytesIO):
+        return input_data.getvalue()
+    
+    # A spooled upload still held in memory has no name; read it once rather
+    # than asking for a descriptor, which would roll it over to disk
+    if isinstance(input_data, tempfile.SpooledTemporaryFile) and input_data.name is None:
+        return as_bytes(input_data)
+    
+    try:
+        fileno = input_data.fileno()
+    except (AttributeError, OSError):
+        return as_bytes(input_data)
+    
+    # Mapping can't see bytes still sitting in the stream's write buffer, and
+    # an empty file can't be mapped at all
+    input_data.flush()
+    if os.fstat(fileno).st_size == 0:
+        return b""
+    return memoryview(mmap.mmap(fileno, 0, access=mmap.ACCESS_READ))
+
+def file_path(input_data: InputData) -> Optional[str]:
+    """Path of the file on disk backing the input, for tools that can read it in place"""
+    name = getattr(input_data, 'name', None)
+    if isinstance(name, str) and os.path.isfile(name):
+        return name
+    return None
+
+def as_stream(input_data: InputData) -> BinaryIO:
+    """Get a seekable stream positioned at the start of the input"""
+    if isinstance(input_data, _BUFFER_TYPES):
+        return io.BytesIO(input_data)
+    input_data.seek(0)
+    return input_data
+
+def copy_to_file(input_data: InputData, output_file: BinaryIO):
+    """Write the input into an open file, copying streams in chunks rather than reading them whole"""
+    if isinstance(input_data, _BUFFER_TYPES):
+        output_file.write(input_data)
+        return
+    input_data.seek(0)
+    shutil.copyfileobj(input_data, output_file, _COPY_BUFFER_SIZE)
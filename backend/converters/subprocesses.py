@@ -0,0 +1,17 @@
+import subprocess
+from typing import List, Optional
+
+def run_tool(command: List[str], input_data: Optional[bytes] = None) -> bytes:
+    """Run an FFmpeg/ffprobe command and return its stdout, raising the tail of
+    its error output if it fails"""
+    process = subprocess.Popen(
+        command,
+        stdin=subprocess.PIPE if input_data is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE
+    )
+    stdout, stderr = process.communicate(input_data)
+    if process.returncode != 0:
+        raise Exception(f"{command[0]} exited with code {process.returncode}: "
+                        f"{stderr.decode('utf-8', errors='ignore').strip()[-500:]}")
+    return stdout
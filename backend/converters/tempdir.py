@@ -0,0 +1,5 @@
+import os
+
+# Scratch files go to RAM-backed tmpfs when the host has it; None falls back
+# to tempfile's default directory (e.g. on macOS)
+TEMP_DIR = '/dev/shm' if os.path.isdir('/dev/shm') and os.access('/dev/shm', os.W_OK) else None
@@ -1,84 +1,126 @@
 import os
-import io
+import subprocess
 import tempfile
-from typing import BinaryIO
+from functools import lru_cache
+from typing import BinaryIO, List, Optional, Tuple
 from moviepy import VideoFileClip
-import cv2
-import numpy as np
-from PIL import Image
+from .tempdir import TEMP_DIR
+from .subprocesses import run_tool
+from .streams import InputData, copy_to_file, file_path
+
+# Video -> GIF filter graph: cap the frame rate at 10 fps and the width at 640px,
+# then build one palette for the clip and dither every frame against it
+_GIF_FILTERS = (
+    "fps='min(10,source_fps)',"
+    "scale='min(640,iw)':-1:flags=lanczos,"
+    "split[s0][s1];[s0]palettegen[p];[s1][p]paletteuse"
+)
+
+# Video/audio encoders per target container; 'h264' resolves to the best
+# H.264 encoder this host has (see _h264_encoder)
+_VIDEO_CODECS = {
+    'mp4': ('h264', 'aac'),
+    'avi': ('h264', 'aac'),
+    'mov': ('h264', 'aac'),
+    'wmv': ('h264', 'aac'),
+    'flv': ('h264', 'aac'),
+    'mkv': ('h264', 'aac'),
+    'm4v': ('h264', 'aac'),
+    'webm': ('libvpx', 'libvorbis'),
+    'ogv': ('libtheora', 'libvorbis'),
+}
+
+# MP4-family containers register the same codecs, so converting between them
+# (or into Matroska, which holds anything) copies the streams instead of
+# re-encoding. MP4-family outputs get their index moved to the front so
+# playback can start before the download finishes.
+_MP4_CONTAINERS = {'mp4', 'mov', 'm4v'}
+_REMUX_TARGETS = _MP4_CONTAINERS | {'mkv'}
+
+# Hardware H.264 encoders to try before libx264, with the options each needs.
+# They are listed by `ffmpeg -encoders` whenever FFmpeg was built with them, so
+# each one is test-encoded before use to make sure the device is really there.
+_H264_HW_ENCODERS = [
+    ('h264_nvenc', ['-pix_fmt', 'yuv420p', '-preset', 'p4', '-rc', 'vbr', '-cq', '23']),
+    ('h264_qsv', ['-pix_fmt', 'nv12', '-global_quality', '23']),
+]
+_H264_SW_ENCODER = ('libx264', ['-pix_fmt', 'yuv420p'])
+
+# Keep the first video stream and the first audio stream if there is one;
+# subtitle, data and extra tracks (timecodes, chapters, cover art) often
+# can't be stored in the target container and would fail the whole run
+_MAIN_STREAMS = ['-map', '0:v:0', '-map', '0:a:0?', '-sn', '-dn']
+
+# 4:2:0 chroma needs even frame dimensions
+_EVEN_DIMENSIONS = "scale=trunc(iw/2)*2:trunc(ih/2)*2"
+
+@lru_cache(maxsize=None)
+def _h264_encoder() -> Tuple[str, List[str]]:
+    """Pick the H.264 encoder for this host, probing hardware encoders once per process"""
+    for name, args in _H264_HW_ENCODERS:
+        probe = subprocess.run(
+            ['ffmpeg', '-v', 'error', '-f', 'lavfi', '-i', 'color=size=256x256:duration=0.1',
+             '-c:v', name, *args, '-f', 'null', '-'],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
+        if probe.returncode == 0:
+            return name, args
+    return _H264_SW_ENCODER
 
 class VideoConverter:
+    @staticmethod
+    def _input_path(input_file: InputData, source_format: str) -> Tuple[str, Optional[str]]:
+        """Path MoviePy/FFmpeg can read the input from, plus the temporary copy to delete if one was needed"""
+        path = file_path(input_file)
+        if path is not None:
+            return path, None
+        with tempfile.NamedTemporaryFile(suffix=f'.{source_format.lower()}', delete=False, dir=TEMP_DIR) as temp_input:
+            copy_to_file(input_file, temp_input)
+            return temp_input.name, temp_input.name
+    
     @staticmethod
     def convert_video(input_file: BinaryIO, source_format: str, target_format: str) -> bytes:
         """Convert video from one format to another"""
         try:
-            input_file.seek(0)
-            
             # Create temporary files
-            with tempfile.NamedTemporaryFile(suffix=f'.{source_format.lower()}', delete=False) as temp_input:
-                temp_input.write(input_file.read())
-                temp_input_path = temp_input.name
+            input_path, temp_input_path = VideoConverter._input_path(input_file, source_format)
             
-            with tempfile.NamedTemporaryFile(suffix=f'.{target_format.lower()}', delete=False) as temp_output:
+            with tempfile.NamedTemporaryFile(suffix=f'.{target_format.lower()}', delete=False, dir=TEMP_DIR) as temp_output:
                 temp_output_path = temp_output.name
             
             try:
-                # Load video
-                video = VideoFileClip(temp_input_path)
-                
-                # Set codec based on target format
-                codec_map = {
-                    'mp4': 'libx264',
-                    'avi': 'libx264',
-                    'mov': 'libx264',
-                    'wmv': 'libx264',
-                    'flv': 'libx264',
-                    'mkv': 'libx264',
-                    'webm': 'libvpx',
-                    'ogv': 'libtheora',
-                    'm4v': 'libx264'
-                }
-                
-                codec = codec_map.get(target_format.lower(), 'libx264')
-                
-                # Convert video with simpler approach
-                try:
-                    if target_format.lower() == 'avi':
-                        # For AVI, use a more compatible approach
-                        video.write_videofile(
-                            temp_output_path,
-                            codec='libx264',
-                            audio_codec='aac',
-                            temp_audiofile='temp-audio.m4a',
-                            remove_temp=True
-                        )
-                    elif target_format.lower() == 'webm':
-                        video.write_videofile(
-                            temp_output_path,
-                            codec='libvpx',
-                            audio_codec='libvorbis',
-                            temp_audiofile='temp-audio.m4a',
-                            remove_temp=True
-                        )
-                    elif target_format.lower() == 'ogv':
-                        video.write_videofile(
-                            temp_output_path,
-                            codec='libtheora',
-                            audio_codec='libvorbis',
-                            temp_audiofile='temp-audio.ogg',
-                            remove_temp=True
-                        )
+                source_format = source_format.lower()
+                target_format = target_format.lower()
+                
+                remuxed = False
+                if source_format in _MP4_CONTAINERS and target_format in _REMUX_TARGETS:
+                    # Rewrap the streams as they are; a target that can't hold the
+                    # source's codecs makes FFmpeg fail, and then we transcode
+                    faststart = ['-movflags', '+faststart'] if target_format in _MP4_CONTAINERS else []
+                    try:
+                        run_tool(['ffmpeg', '-y', '-i', input_path, *_MAIN_STREAMS, '-c', 'copy', *faststart, temp_output_path])
+                        remuxed = True
+                    except Exception:
+                        pass
+                
+                if not remuxed:
+                    # FFmpeg decodes and encodes directly; MoviePy would pipe every
+                    # frame through Python as raw RGB and mux the audio separately
+                    video_codec, audio_codec = _VIDEO_CODECS.get(target_format, ('h264', 'aac'))
+                    if video_codec == 'h264':
+                        video_codec, video_args = _h264_encoder()
+                        video_args = ['-vf', _EVEN_DIMENSIONS, *video_args]
                     else:
-                        video.write_videofile(
-                            temp_output_path,
-                            codec=codec,
-                            temp_audiofile='temp-audio.m4a',
-                            remove_temp=True
-                        )
-                except Exception as write_error:
-                    raise Exception(f"MoviePy write_videofile failed: {str(write_error)}")
-                
-                video.close()
+                        video_args = []
+                    
+                    run_tool([
+                        'ffmpeg', '-y', '-i', input_path, *_MAIN_STREAMS,
+                        '-c:v', video_codec, *video_args,
+                        '-c:a', audio_codec,
+                        temp_output_path
+                    ])
                 
                 # Check if output file exists and has content
                 if not os.path.exists(temp_output_path):
@@ -95,28 +137,24 @@ class VideoConverter:
             finally:
                 # Clean up temporary files
                 for path in [temp_input_path, temp_output_path]:
-                    if os.path.exists(path):
+                    if path and os.path.exists(path):
                         os.unlink(path)
                         
         except Exception as e:
-            raise Exception(f"Video conversion failed: {str(e)}")
+            raise Exception(f"Video conversion failed: {str(e)}") from e
     
     @staticmethod
     def extract_audio_from_video(input_file: BinaryIO, source_format: str, target_audio_format: str) -> bytes:
         """Extract audio from video file"""
         try:
-            input_file.seek(0)
+            input_path, temp_input_path = VideoConverter._input_path(input_file, source_format)
             
-            with tempfile.NamedTemporaryFile(suffix=f'.{source_format.lower()}', delete=False) as temp_input:
-                temp_input.write(input_file.read())
-                temp_input_path = temp_input.name
-            
-            with tempfile.NamedTemporaryFile(suffix=f'.{target_audio_format.lower()}', delete=False) as temp_output:
+            with tempfile.NamedTemporaryFile(suffix=f'.{target_audio_format.lower()}', delete=False, dir=TEMP_DIR) as temp_output:
                 temp_output_path = temp_output.name
             
             try:
                 # Load video and extract audio
-                video = VideoFileClip(temp_input_path)
+                video = VideoFileClip(input_path)
                 audio = video.audio
                 
                 if audio is None:
@@ -144,80 +182,48 @@ class VideoConverter:
             finally:
                 # Clean up temporary files
                 for path in [temp_input_path, temp_output_path]:
-                    if os.path.exists(path):
+                    if path and os.path.exists(path):
                         os.unlink(path)
                         
         except Exception as e:
-            raise Exception(f"Audio extraction failed: {str(e)}")
+            raise Exception(f"Audio extraction failed: {str(e)}") from e
     
     @staticmethod
     def convert_video_to_gif(input_file: BinaryIO, source_format: str, max_duration: int = 10) -> bytes:
         """Convert video to animated GIF"""
         try:
-            input_file.seek(0)
+            input_path, temp_input_path = VideoConverter._input_path(input_file, source_format)
             
-            with tempfile.NamedTemporaryFile(suffix=f'.{source_format.lower()}', delete=False) as temp_input:
-                temp_input.write(input_file.read())
-                temp_input_path = temp_input.name
+            with tempfile.NamedTemporaryFile(suffix='.gif', delete=False, dir=TEMP_DIR) as temp_output:
+                temp_output_path = temp_output.name
             
             try:
-                # Load video
-                video = VideoFileClip(temp_input_path)
-                
-                # Limit duration for GIF
-                if video.duration > max_duration:
-                    video = video.subclip(0, max_duration)
-                
-                # Resize if too large (GIFs should be smaller)
-                if video.w > 640:
-                    video = video.resize(width=640)
-                
-                # Convert to GIF
-                output_buffer = io.BytesIO()
-                
-                # Extract frames and create GIF using PIL
-                frames = []
-                fps = min(video.fps, 10)  # Limit fps for smaller file size
-                
-                for t in np.arange(0, video.duration, 1.0/fps):
-                    frame = video.get_frame(t)
-                    pil_frame = Image.fromarray(frame)
-                    frames.append(pil_frame)
-                
-                video.close()
+                # FFmpeg decodes, scales and palettizes in one native pass instead
+                # of handing every frame to Python as a full-size image
+                run_tool([
+                    'ffmpeg', '-y', '-t', str(max_duration), '-i', input_path,
+                    '-vf', _GIF_FILTERS, '-loop', '0', '-f', 'gif', temp_output_path
+                ])
                 
-                if frames:
-                    frames[0].save(
-                        output_buffer,
-                        format='GIF',
-                        save_all=True,
-                        append_images=frames[1:],
-                        duration=int(1000/fps),
-                        loop=0,
-                        optimize=True
-                    )
-                
-                return output_buffer.getvalue()
+                with open(temp_output_path, 'rb') as output_file:
+                    return output_file.read()
                 
             finally:
-                if os.path.exists(temp_input_path):
-                    os.unlink(temp_input_path)
+                for path in [temp_input_path, temp_output_path]:
+                    if path and os.path.exists(path):
+                        os.unlink(path)
                     
         except Exception as e:
-            raise Exception(f"Video to GIF conversion failed: {str(e)}")
+            raise Exception(f"Video to GIF conversion failed: {str(e)}") from e
     
     @staticmethod
     def get_video_info(input_file: BinaryIO, source_format: str) -> dict:
         """Get video file information"""
         try:
-            input_file.seek(0)
-            
-            with tempfile.NamedTemporaryFile(suffix=f'.{source_format.lower()}', delete=False) as temp_file:
-                temp_file.write(input_file.read())
-                temp_path = temp_file.name
+            input_path, temp_input_path = VideoConverter._input_path(input_file, source_format)
             
             try:
-                video = VideoFileClip(temp_path)
+                video = VideoFileClip(input_path)
                 
                 info = {
                     'duration_seconds': video.duration,
@@ -231,8 +237,8 @@ class VideoConverter:
                 return info
                 
             finally:
-                if os.path.exists(temp_path):
-                    os.unlink(temp_path)
+                if temp_input_path and os.path.exists(temp_input_path):
+                    os.unlink(temp_input_path)
                     
         except Exception as e:
             return {'error': str(e)}
\ No newline at end of file
@@ -1,5 +1,5 @@
 from fastapi import FastAPI, APIRouter, File, UploadFile, HTTPException, Form
-from fastapi.responses import StreamingResponse
+from fastapi.responses import Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -7,13 +7,16 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Set
 import uuid
 from datetime import datetime
-import io
 import tempfile
 import asyncio
+from contextlib import asynccontextmanager
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
 from converters.converter_manager import ConversionManager
+from converters.pool import get_pool, reset_pool, shutdown_pool
 from utils.cache import cache
 
 # Initialize conversion manager
@@ -69,6 +72,90 @@ class ConversionJobCreate(BaseModel):
     source_format: str
     target_format: str
 
+# Conversions are CPU-bound and mostly hold the GIL, so they run in the shared
+# worker pool rather than on the event loop. Each source category may occupy at
+# most this many workers at once, so a burst of video jobs can't starve the rest.
+_CATEGORY_CONCURRENCY = int(os.environ.get('MAX_CONVERSIONS_PER_CATEGORY', '2'))
+_category_slots: Dict[str, asyncio.Semaphore] = {}
+
+def category_slot(source_format: str) -> asyncio.Semaphore:
+    """Semaphore limiting how many conversions of this format's category run at once"""
+    category = ConversionManager.get_format_category(source_format)
+    return _category_slots.setdefault(category, asyncio.Semaphore(_CATEGORY_CONCURRENCY))
+
+async def run_in_worker(func, *args, **kwargs):
+    """Run a ConversionManager call in a worker process.
+    
+    A worker that dies (OOM kill, crash in a native parser) breaks the whole
+    pool, so it is replaced and the call retried once on the new pool.
+    """
+    loop = asyncio.get_running_loop()
+    call = partial(func, *args, **kwargs)
+    for attempt in range(2):
+        pool = get_pool()
+        try:
+            return await loop.run_in_executor(pool, call)
+        except BrokenProcessPool:
+            reset_pool(pool)
+            if attempt:
+                raise
+
+async def run_in_pool(source_format: str, func, *args, **kwargs):
+    """Run a ConversionManager call in a worker process, queuing behind others of the same category"""
+    async with category_slot(source_format):
+        return await run_in_worker(func, *args, **kwargs)
+
+# Uploads are streamed to disk in chunks of this size instead of being read whole
+_UPLOAD_CHUNK_SIZE = 1 << 20
+
+# Uploads are staged on disk in the system temp directory by default. Setting
+# UPLOAD_TEMP_DIR (e.g. to a tmpfs) moves them there, falling back to the
+# default directory when it runs out of space.
+_UPLOAD_DIR = os.environ.get('UPLOAD_TEMP_DIR') or None
+
+async def _stage_upload(file: UploadFile, source_format: str, directory: Optional[str]) -> str:
+    """Copy an upload into a new temporary file in the directory and return its path"""
+    await file.seek(0)
+    temp_file = tempfile.NamedTemporaryFile(suffix=f'.{source_format}', delete=False, dir=directory)
+    try:
+        with temp_file:
+            while chunk := await file.read(_UPLOAD_CHUNK_SIZE):
+                temp_file.write(chunk)
+    except BaseException:
+        os.unlink(temp_file.name)
+        raise
+    return temp_file.name
+
+@asynccontextmanager
+async def saved_upload(file: UploadFile, source_format: str) -> AsyncIterator[str]:
+    """Copy an upload into a temporary file and yield its path, deleting the file afterwards"""
+    try:
+        path = await _stage_upload(file, source_format, _UPLOAD_DIR)
+    except OSError:
+        if _UPLOAD_DIR is None:
+            raise
+        logger.warning(f"Could not stage upload in {_UPLOAD_DIR}; using the default temp directory")
+        path = await _stage_upload(file, source_format, None)
+    try:
+        yield path
+    finally:
+        os.unlink(path)
+
+# Job records are written once a conversion's outcome is known, without making
+# the response wait on MongoDB; the set keeps pending inserts referenced
+_pending_job_writes: Set[asyncio.Task] = set()
+
+def _job_written(task: asyncio.Task):
+    _pending_job_writes.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Failed to record conversion job: {task.exception()}")
+
+def record_job(job: ConversionJob):
+    """Store a finished conversion job in the background"""
+    task = asyncio.create_task(db.conversion_jobs.insert_one(job.dict()))
+    _pending_job_writes.add(task)
+    task.add_done_callback(_job_written)
+
 # Add your routes to the router instead of directly to app
 @api_router.get("/")
 async def root():
@@ -94,10 +181,6 @@ async def upload_files(files: List[UploadFile] = File(...)):
         uploaded_files = []
         
         for file in files:
-            # Get file info
-            content = await file.read()
-            file_size = len(content)
-            
             # Extract format from filename
             filename = file.filename or "unknown"
             source_format = filename.split('.')[-1].lower() if '.' in filename else 'unknown'
@@ -105,8 +188,16 @@ async def upload_files(files: List[UploadFile] = File(...)):
             # Get supported target formats
             supported_formats = ConversionManager.get_supported_formats(source_format)
             
-            # Get additional file info if possible
-            file_info = ConversionManager.get_file_info(io.BytesIO(content), source_format)
+            # Get file info. Only audio and video need a probe, which runs in a
+            # worker reading the upload by path but doesn't wait for a
+            # conversion slot; everything else is just measured here.
+            async with saved_upload(file, source_format) as upload_path:
+                file_size = os.path.getsize(upload_path)
+                if ConversionManager.file_info_needs_probe(source_format):
+                    file_info = await run_in_worker(ConversionManager.get_file_info,
+                                                    upload_path, source_format)
+                else:
+                    file_info = ConversionManager.get_file_info(upload_path, source_format)
             
             uploaded_files.append({
                 "id": str(uuid.uuid4()),
@@ -140,8 +231,6 @@ async def convert_file(
 ):
     """Convert a single file to target format"""
     try:
-        # Read file content
-        content = await file.read()
         filename = file.filename or "unknown"
         source_format = filename.split('.')[-1].lower() if '.' in filename else 'unknown'
         
@@ -152,72 +241,64 @@ async def convert_file(
                 detail=f"Conversion from {source_format} to {target_format} is not supported"
             )
         
-        # Create conversion job record
-        job = ConversionJob(
-            filename=filename,
-            source_format=source_format.upper(),
-            target_format=target_format.upper(),
-            status="processing",
-            file_size=len(content)
-        )
-        
-        # Store job in database
-        await db.conversion_jobs.insert_one(job.dict())
-        
-        # Perform conversion
-        try:
-            # Create conversion options
-            conversion_options = {
-                'image_quality': image_quality,
-                'max_width': max_width,
-                'max_height': max_height,
-                'compression_level': compression_level,
-                'preserve_metadata': preserve_metadata
-            }
-            
-            converted_data = ConversionManager.convert_file(
-                io.BytesIO(content), 
-                source_format, 
-                target_format.lower(),
-                **conversion_options
-            )
-            
-            # Update job status
-            await db.conversion_jobs.update_one(
-                {"id": job.id},
-                {
-                    "$set": {
-                        "status": "completed",
-                        "completed_at": datetime.utcnow()
-                    }
-                }
-            )
-            
-            # Generate output filename
-            base_name = '.'.join(filename.split('.')[:-1]) if '.' in filename else filename
-            output_filename = f"{base_name}.{target_format.lower()}"
+        # Stream the upload to disk; the conversion worker reads it by path
+        async with saved_upload(file, source_format) as upload_path:
+            file_size = os.path.getsize(upload_path)
             
-            # Return converted file
-            return StreamingResponse(
-                io.BytesIO(converted_data),
-                media_type="application/octet-stream",
-                headers={"Content-Disposition": f"attachment; filename={output_filename}"}
+            # Create conversion job record
+            job = ConversionJob(
+                filename=filename,
+                source_format=source_format.upper(),
+                target_format=target_format.upper(),
+                status="processing",
+                file_size=file_size
             )
             
-        except Exception as conversion_error:
-            # Update job with error
-            await db.conversion_jobs.update_one(
-                {"id": job.id},
-                {
-                    "$set": {
-                        "status": "failed",
-                        "error_message": str(conversion_error),
-                        "completed_at": datetime.utcnow()
-                    }
+            # Perform conversion
+            try:
+                # Create conversion options
+                conversion_options = {
+                    'image_quality': image_quality,
+                    'max_width': max_width,
+                    'max_height': max_height,
+                    'compression_level': compression_level,
+                    'preserve_metadata': preserve_metadata
                 }
-            )
-            raise HTTPException(status_code=500, detail=f"Conversion failed: {str(conversion_error)}")
-            
+                
+                converted_data = await run_in_pool(
+                    source_format,
+                    ConversionManager.convert_file,
+                    upload_path,
+                    source_format, 
+                    target_format.lower(),
+                    **conversion_options
+                )
+                
+                # Store the finished job in one write
+                job.status = "completed"
+                job.completed_at = datetime.utcnow()
+                record_job(job)
+                
+                # Generate output filename
+                base_name = '.'.join(filename.split('.')[:-1]) if '.' in filename else filename
+                output_filename = f"{base_name}.{target_format.lower()}"
+                
+                # Return converted file. The payload is already in memory, so send it as
+                # one body instead of re-chunking it through a BytesIO iterator
+                return Response(
+                    content=converted_data,
+                    media_type="application/octet-stream",
+                    headers={"Content-Disposition": f"attachment; filename={output_filename}"}
+                )
+                
+            except Exception as conversion_error:
+                # Store the failed job with its error
+                job.status = "failed"
+                job.error_message = str(conversion_error)
+                job.completed_at = datetime.utcnow()
+                record_job(job)
+                raise HTTPException(status_code=500, detail=f"Conversion failed: {str(conversion_error)}")
+                
     except HTTPException:
         raise
     except Exception as e:
@@ -233,10 +314,7 @@ async def convert_batch(
         import json
         format_mapping = json.loads(target_formats)
         
-        results = []
-        
-        for i, file in enumerate(files):
-            content = await file.read()
+        async def convert_one(i: int, file: UploadFile) -> dict:
             filename = file.filename or f"file_{i}"
             source_format = filename.split('.')[-1].lower() if '.' in filename else 'unknown'
             
@@ -244,28 +322,36 @@ async def convert_batch(
             target_format = format_mapping.get(filename, format_mapping.get(str(i), 'pdf')).lower()
             
             try:
-                converted_data = ConversionManager.convert_file(
-                    io.BytesIO(content),
-                    source_format,
-                    target_format
-                )
+                # Stage each file only once it has a conversion slot, so a large
+                # batch doesn't copy every upload to disk up front
+                async with category_slot(source_format), saved_upload(file, source_format) as upload_path:
+                    converted_data = await run_in_worker(
+                        ConversionManager.convert_file,
+                        upload_path,
+                        source_format,
+                        target_format
+                    )
                 
                 base_name = '.'.join(filename.split('.')[:-1]) if '.' in filename else filename
                 output_filename = f"{base_name}.{target_format}"
                 
-                results.append({
+                return {
                     "original_filename": filename,
                     "converted_filename": output_filename,
                     "status": "success",
                     "size": len(converted_data)
-                })
+                }
                 
             except Exception as e:
-                results.append({
+                return {
                     "original_filename": filename,
                     "status": "failed",
                     "error": str(e)
-                })
+                }
+        
+        # Convert the files concurrently so a batch spreads across the pool's
+        # workers; results keep the order the files were sent in
+        results = await asyncio.gather(*(convert_one(i, file) for i, file in enumerate(files)))
         
         return {"results": results}
         
@@ -410,3 +496,7 @@ async def clear_cache():
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
+
+@app.on_event("shutdown")
+async def shutdown_worker_pool():
+    shutdown_pool()
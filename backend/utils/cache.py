@@ -1,186 +1,174 @@
-import hashlib
 import json
 import os
+import shutil
 import time
-from typing import Any, Optional, Dict
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional, Dict, Tuple
 from pathlib import Path
 import tempfile
+import xxhash
+from converters.tempdir import TEMP_DIR
+
+# fcntl is POSIX-only; elsewhere the cache is only locked within one process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 class FileCache:
-    """Simple file-based cache for conversion results"""
+    """Content-addressed disk cache for conversion results with LRU eviction.
+    
+    The cache directory is shared by the server and its worker processes, so
+    it is the only record of what is cached: sizes and entry counts come from
+    scanning it under a file lock. A payload's mtime is when it was stored
+    (for the TTL) and its atime when it was last used (for LRU eviction).
+    """
+    
+    # Without an explicit limit the cache takes at most a quarter of its
+    # filesystem, capped at this size, so it can't crowd conversions' scratch
+    # files out of a small tmpfs
+    DEFAULT_MAX_SIZE_MB = 256
     
-    def __init__(self, cache_dir: str = None, max_size_mb: int = 1000, ttl_seconds: int = 3600):
-        self.cache_dir = Path(cache_dir) if cache_dir else Path(tempfile.gettempdir()) / "converter_cache"
+    def __init__(self, cache_dir: str = None, max_size_mb: Optional[int] = None, ttl_seconds: int = 3600,
+                 max_entries: int = 1024):
+        # Payloads live on tmpfs when available
+        self.cache_dir = Path(cache_dir) if cache_dir else Path(TEMP_DIR or tempfile.gettempdir()) / "converter_cache"
         self.cache_dir.mkdir(exist_ok=True)
+        if max_size_mb is None:
+            filesystem_mb = shutil.disk_usage(self.cache_dir).total // (1024 * 1024)
+            max_size_mb = min(self.DEFAULT_MAX_SIZE_MB, filesystem_mb // 4)
         self.max_size_mb = max_size_mb
+        self.max_entries = max_entries
         self.ttl_seconds = ttl_seconds
-        self.metadata_file = self.cache_dir / "metadata.json"
-        self.metadata = self._load_metadata()
+        self._lock = threading.Lock()
+        self._lock_path = self.cache_dir / ".lock"
     
-    def _load_metadata(self) -> Dict[str, Any]:
-        """Load cache metadata from file"""
-        if self.metadata_file.exists():
-            try:
-                with open(self.metadata_file, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
-                pass
-        return {}
-    
-    def _save_metadata(self):
-        """Save cache metadata to file"""
-        try:
-            with open(self.metadata_file, 'w') as f:
-                json.dump(self.metadata, f, indent=2)
-        except IOError:
-            pass
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        """Hold the cache lock across threads and processes"""
+        # flock is per open file, so threads of one process also need the thread lock
+        with self._lock, open(self._lock_path, 'ab') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            yield
     
     def _generate_key(self, source_format: str, target_format: str, file_hash: str, **options) -> str:
         """Generate cache key from conversion parameters"""
-        key_data = {
-            'source_format': source_format,
-            'target_format': target_format,
-            'file_hash': file_hash,
-            'options': sorted(options.items()) if options else []
-        }
-        key_string = json.dumps(key_data, sort_keys=True)
-        return hashlib.sha256(key_string.encode()).hexdigest()
-    
-    def _get_file_hash(self, file_content: bytes) -> str:
-        """Generate hash for file content"""
-        return hashlib.sha256(file_content).hexdigest()
+        key_string = json.dumps([
+            source_format.lower(),
+            target_format.lower(),
+            sorted(options.items()) if options else [],
+            file_hash
+        ], default=str)
+        return xxhash.xxh3_128(key_string.encode()).hexdigest()
     
     def _get_cache_path(self, key: str) -> Path:
         """Get cache file path for key"""
-        return self.cache_dir / f"{key}.cache"
+        return self.cache_dir / f"{key}.bin"
     
     def _is_expired(self, timestamp: float) -> bool:
         """Check if cache entry is expired"""
         return time.time() - timestamp > self.ttl_seconds
     
-    def _cleanup_expired(self):
-        """Remove expired cache entries"""
-        current_time = time.time()
-        expired_keys = []
-        
-        for key, metadata in self.metadata.items():
-            if self._is_expired(metadata.get('timestamp', 0)):
-                expired_keys.append(key)
-        
-        for key in expired_keys:
-            self._remove_entry(key)
+    @staticmethod
+    def _unlink(path):
+        """Delete a file that another process may already have deleted"""
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
     
-    def _remove_entry(self, key: str):
-        """Remove cache entry"""
-        cache_path = self._get_cache_path(key)
-        if cache_path.exists():
-            cache_path.unlink()
-        
-        if key in self.metadata:
-            del self.metadata[key]
+    def _scan(self) -> List[Tuple[float, str, int]]:
+        """List live payloads as (last used, path, size), least recently used
+        first, deleting expired ones; the caller holds the lock"""
+        entries = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith('.bin'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                if self._is_expired(stat.st_mtime):
+                    self._unlink(entry.path)
+                    continue
+                entries.append((stat.st_atime, entry.path, stat.st_size))
+        entries.sort()
+        return entries
     
-    def _cleanup_size(self):
-        """Remove oldest entries if cache is too large"""
-        current_size = sum(
-            self.cache_dir.glob("*.cache"),
-            key=lambda p: p.stat().st_size if p.exists() else 0
-        )
-        
-        if current_size > self.max_size_mb * 1024 * 1024:
-            # Sort by timestamp and remove oldest
-            sorted_entries = sorted(
-                self.metadata.items(),
-                key=lambda x: x[1].get('timestamp', 0)
-            )
-            
-            for key, _ in sorted_entries:
-                self._remove_entry(key)
-                current_size = sum(
-                    self.cache_dir.glob("*.cache"),
-                    key=lambda p: p.stat().st_size if p.exists() else 0
-                )
-                if current_size <= self.max_size_mb * 1024 * 1024:
-                    break
+    def _evict(self):
+        """Drop least recently used entries until the cache fits its limits; the caller holds the lock"""
+        entries = self._scan()
+        count = len(entries)
+        total_size = sum(size for _, _, size in entries)
+        max_size = self.max_size_mb * 1024 * 1024
+        for _, path, size in entries:
+            if count <= self.max_entries and total_size <= max_size:
+                break
+            self._unlink(path)
+            count -= 1
+            total_size -= size
     
-    def get(self, source_format: str, target_format: str, file_content: bytes, **options) -> Optional[bytes]:
-        """Get cached conversion result"""
-        self._cleanup_expired()
-        
-        file_hash = self._get_file_hash(file_content)
+    def get(self, source_format: str, target_format: str, file_hash: str, **options) -> Optional[bytes]:
+        """Get cached conversion result for a precomputed content fingerprint"""
         key = self._generate_key(source_format, target_format, file_hash, **options)
-        
-        if key not in self.metadata:
-            return None
-        
-        metadata = self.metadata[key]
-        if self._is_expired(metadata.get('timestamp', 0)):
-            self._remove_entry(key)
-            return None
-        
         cache_path = self._get_cache_path(key)
-        if not cache_path.exists():
-            self._remove_entry(key)
-            return None
         
         try:
-            with open(cache_path, 'rb') as f:
-                return f.read()
-        except IOError:
-            self._remove_entry(key)
+            stat = cache_path.stat()
+            if self._is_expired(stat.st_mtime):
+                self._unlink(cache_path)
+                return None
+            # Mark the entry as recently used, keeping its storage time
+            os.utime(cache_path, (time.time(), stat.st_mtime))
+            return cache_path.read_bytes()
+        except OSError:
+            # Missing, or evicted by another process while being read
             return None
     
-    def set(self, source_format: str, target_format: str, file_content: bytes, 
+    def set(self, source_format: str, target_format: str, file_hash: str,
             converted_content: bytes, **options) -> bool:
-        """Cache conversion result"""
+        """Cache conversion result for a precomputed content fingerprint"""
+        key = self._generate_key(source_format, target_format, file_hash, **options)
+        
         try:
-            file_hash = self._get_file_hash(file_content)
-            key = self._generate_key(source_format, target_format, file_hash, **options)
-            
-            cache_path = self._get_cache_path(key)
-            
-            # Write converted content to cache
-            with open(cache_path, 'wb') as f:
-                f.write(converted_content)
-            
-            # Update metadata
-            self.metadata[key] = {
-                'timestamp': time.time(),
-                'source_format': source_format,
-                'target_format': target_format,
-                'file_hash': file_hash,
-                'size': len(converted_content),
-                'options': options
-            }
-            
-            self._save_metadata()
-            self._cleanup_size()
+            # Write beside the final path and rename, so readers never see a partial payload
+            fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.cache_dir)
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(converted_content)
+                os.replace(temp_path, self._get_cache_path(key))
+            except BaseException:
+                self._unlink(temp_path)
+                raise
             
-            return True
-        except IOError:
+            with self._locked():
+                self._evict()
+        except OSError:
             return False
+        
+        return True
     
     def clear(self):
         """Clear all cache entries"""
-        for cache_file in self.cache_dir.glob("*.cache"):
-            cache_file.unlink()
-        
-        self.metadata = {}
-        self._save_metadata()
+        with self._locked():
+            for cache_file in self.cache_dir.glob("*.bin"):
+                self._unlink(cache_file)
     
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
-        self._cleanup_expired()
-        
-        total_size = sum(
-            p.stat().st_size for p in self.cache_dir.glob("*.cache") if p.exists()
-        )
+        with self._locked():
+            entries = self._scan()
         
         return {
-            'entries': len(self.metadata),
-            'total_size_mb': total_size / (1024 * 1024),
+            'entries': len(entries),
+            'total_size_mb': sum(size for _, _, size in entries) / (1024 * 1024),
             'max_size_mb': self.max_size_mb,
+            'max_entries': self.max_entries,
             'ttl_seconds': self.ttl_seconds
         }
 
 # Global cache instance
-cache = FileCache()
\ No newline at end of file
+cache = FileCache()
@@ -0,0 +1,109 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+from utils.cache import FileCache
+
+
+def _age(cache, file_hash, seconds, accessed=True, modified=False):
+    """Move a cached payload's last use and/or storage time into the past"""
+    path = cache._get_cache_path(cache._generate_key('png', 'jpg', file_hash))
+    stat = path.stat()
+    atime = time.time() - seconds if accessed else stat.st_atime
+    mtime = time.time() - seconds if modified else stat.st_mtime
+    os.utime(path, (atime, mtime))
+
+
+def test_roundtrip_and_option_keys(tmp_path):
+    cache = FileCache(cache_dir=str(tmp_path))
+    assert cache.set('png', 'jpg', 'abc', b'payload', image_quality=80)
+    assert cache.get('png', 'jpg', 'abc', image_quality=80) == b'payload'
+    assert cache.get('png', 'jpg', 'abc', image_quality=90) is None
+    assert cache.get('png', 'webp', 'abc', image_quality=80) is None
+
+
+def test_evicts_least_recently_used_over_entry_limit(tmp_path):
+    cache = FileCache(cache_dir=str(tmp_path), max_entries=2)
+    cache.set('png', 'jpg', 'a', b'a')
+    _age(cache, 'a', 30)
+    cache.set('png', 'jpg', 'b', b'b')
+    _age(cache, 'b', 20)
+
+    # Reading 'a' makes 'b' the least recently used entry
+    assert cache.get('png', 'jpg', 'a') == b'a'
+    cache.set('png', 'jpg', 'c', b'c')
+
+    assert cache.get('png', 'jpg', 'b') is None
+    assert cache.get('png', 'jpg', 'a') == b'a'
+    assert cache.get('png', 'jpg', 'c') == b'c'
+    assert cache.get_stats()['entries'] == 2
+
+
+def test_evicts_over_size_limit(tmp_path):
+    cache = FileCache(cache_dir=str(tmp_path), max_size_mb=1)
+    payload = b'x' * (400 * 1024)
+    for age, file_hash in enumerate(['c', 'b', 'a']):
+        cache.set('png', 'jpg', file_hash, payload)
+        _age(cache, file_hash, 10 - age)
+
+    cache.set('png', 'jpg', 'd', payload)
+
+    stats = cache.get_stats()
+    assert stats['entries'] == 2
+    assert stats['total_size_mb'] <= 1
+    assert cache.get('png', 'jpg', 'c') is None
+    assert cache.get('png', 'jpg', 'd') == payload
+
+
+def test_expired_entries_are_dropped(tmp_path):
+    cache = FileCache(cache_dir=str(tmp_path), ttl_seconds=60)
+    cache.set('png', 'jpg', 'old', b'old')
+    cache.set('png', 'jpg', 'new', b'new')
+    _age(cache, 'old', 120, modified=True)
+
+    assert cache.get_stats()['entries'] == 1
+    assert cache.get('png', 'jpg', 'old') is None
+    assert cache.get('png', 'jpg', 'new') == b'new'
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_use_does_not_extend_ttl(tmp_path):
+    cache = FileCache(cache_dir=str(tmp_path), ttl_seconds=60)
+    cache.set('png', 'jpg', 'a', b'a')
+    _age(cache, 'a', 50, accessed=False, modified=True)
+
+    assert cache.get('png', 'jpg', 'a') == b'a'
+    _age(cache, 'a', 70, accessed=False, modified=True)
+    assert cache.get('png', 'jpg', 'a') is None
+
+
+def test_instances_share_the_directory(tmp_path):
+    # Each worker process has its own FileCache over the same directory
+    writer = FileCache(cache_dir=str(tmp_path))
+    reader = FileCache(cache_dir=str(tmp_path))
+
+    writer.set('png', 'jpg', 'a', b'a' * 1024)
+    assert reader.get('png', 'jpg', 'a') == b'a' * 1024
+    stats = reader.get_stats()
+    assert stats['entries'] == 1
+    assert stats['total_size_mb'] == 1024 / (1024 * 1024)
+
+    reader.clear()
+    assert writer.get('png', 'jpg', 'a') is None
+    assert writer.get_stats()['entries'] == 0
+
+
+def test_limits_apply_across_instances(tmp_path):
+    first = FileCache(cache_dir=str(tmp_path), max_entries=2)
+    second = FileCache(cache_dir=str(tmp_path), max_entries=2)
+
+    first.set('png', 'jpg', 'a', b'a')
+    _age(first, 'a', 10)
+    second.set('png', 'jpg', 'b', b'b')
+    first.set('png', 'jpg', 'c', b'c')
+
+    assert second.get_stats()['entries'] == 2
+    assert second.get('png', 'jpg', 'a') is None